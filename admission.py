@@ -0,0 +1,252 @@
+# pylint: disable=R0903,R0913,R0917
+
+"""
+Admission control: per-client rate limiting and per-route-class
+concurrency limits with load shedding.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBuckets:
+    """
+    Token buckets kept in this process, evicting the least recently used
+    client beyond `max_clients`.
+    """
+
+    def __init__(self, max_clients=100000, clock=time.monotonic):
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, rate, burst):
+        """
+        Takes a token from a client's bucket.
+
+        Parameters
+        ----------
+        key : str
+            Identifies the client.
+        rate : float
+            Tokens added per second.
+        burst : float
+            Bucket capacity.
+
+        Returns
+        -------
+        float
+            0 if a token was taken, otherwise seconds until one is available.
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (burst, now))
+            tokens, wait = _refill_and_take(tokens, stamp, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SharedBuckets:
+    """
+    Token buckets in a memory-mapped file, shared by all workers on a host.
+
+    Clients are hashed into sets of `ways` slots. A new client takes over
+    an empty slot or one whose bucket has refilled completely, so no active
+    client's state is lost; if every slot in its set is active, it shares
+    the bucket of the least recently used one until a slot goes idle.
+    """
+
+    _SLOT = struct.Struct("<Qdd")
+
+    def __init__(self, path, slots=65536, ways=4, clock=time.time):
+        self.slots = slots
+        self.ways = ways
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < slots * self._SLOT.size:
+            os.ftruncate(self._fd, slots * self._SLOT.size)
+        self._map = mmap.mmap(self._fd, slots * self._SLOT.size)
+
+    def take(self, key, rate, burst):
+        """
+        Takes a token from a client's bucket; see MemoryBuckets.take.
+        """
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        digest = int.from_bytes(digest, "little")
+        first = (digest % (self.slots // self.ways)) * self.ways
+        now = self._clock()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, owner, tokens, stamp = self._find(first, digest, now, rate, burst)
+                tokens, wait = _refill_and_take(tokens, stamp, now, rate, burst)
+                self._SLOT.pack_into(self._map, offset, owner, tokens, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return wait
+
+    def _find(self, first, digest, now, rate, burst):
+        """
+        Picks the slot of a client among the set starting at slot `first`.
+
+        Returns
+        -------
+        tuple
+            (offset, owner, tokens, stamp) of the slot. A slot taken over
+            by the client holds a full bucket; a shared one keeps its
+            occupant and state.
+        """
+        candidates = []
+        for slot in range(first, first + self.ways):
+            offset = slot * self._SLOT.size
+            owner, tokens, stamp = self._SLOT.unpack_from(self._map, offset)
+            if owner == digest:
+                return offset, owner, tokens, stamp
+            # A bucket that has refilled completely is as good as a new one
+            busy = owner != 0 and tokens + max(0.0, now - stamp) * rate < burst
+            candidates.append((busy, stamp, offset, owner, tokens))
+        busy, stamp, offset, owner, tokens = min(candidates)
+        if not busy:
+            return offset, digest, burst, now
+        return offset, owner, tokens, stamp
+
+
+def _refill_and_take(tokens, stamp, now, rate, burst):
+    """
+    Refills a bucket for the time elapsed and tries to take a token.
+
+    Returns
+    -------
+    tuple
+        (float, float) - (tokens left, seconds to wait or 0 if taken)
+    """
+    tokens = min(burst, tokens + max(0.0, now - stamp) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the requests of one route class running at once.
+
+    Requests wait for a free slot for at most `max_queue_time` seconds and
+    are shed if none frees up by then.
+    """
+
+    def __init__(self, limit, max_queue_time=1.0):
+        self.limit = limit
+        self.max_queue_time = max_queue_time
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits for a slot; returns False if the request should be shed.
+        """
+        with self._condition:
+            admitted = self._condition.wait_for(
+                lambda: self.active < self.limit, self.max_queue_time
+            )
+            if admitted:
+                self.active += 1
+            return admitted
+
+    def release(self):
+        """
+        Frees a slot taken by acquire().
+        """
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class AdmissionController:
+    """
+    Decides whether to run a request, throttle it (429) or shed it (503).
+
+    Parameters
+    ----------
+    rate : float, optional
+        Requests per second allowed per client; no rate limit if None.
+    burst : float, optional
+        Requests a client may make at once; defaults to `rate`, and is at
+        least 1.
+    buckets : MemoryBuckets or SharedBuckets, optional
+        Where token buckets are kept; defaults to this process.
+    read_limit, write_limit : int
+        Concurrent reads and writes allowed.
+    max_queue_time : float
+        Seconds a request may wait for a concurrency slot.
+    """
+
+    def __init__(self, rate=None, burst=None, buckets=None, read_limit=64,
+                 write_limit=16, max_queue_time=1.0):
+        self.rate = rate
+        # A bucket must hold at least one token or no request ever passes
+        self.burst = max(1.0, burst or rate) if rate else None
+        self.buckets = buckets or MemoryBuckets()
+        self.limiters = {
+            "read": ConcurrencyLimiter(read_limit, max_queue_time),
+            "write": ConcurrencyLimiter(write_limit, max_queue_time),
+        }
+        self.counts = {"admitted": 0, "throttled": 0, "shed": 0}
+        self._lock = threading.Lock()
+
+    def admit(self, client, route_class):
+        """
+        Admits a request, taking a concurrency slot for it.
+
+        Parameters
+        ----------
+        client : str
+            Identifies the client for rate limiting.
+        route_class : str
+            'read' or 'write'.
+
+        Returns
+        -------
+        tuple
+            (int, int) - (status, retry_after) where status is 0 if the
+            request was admitted, otherwise 429 or 503.
+        """
+        if self.rate:
+            wait = self.buckets.take(client, self.rate, self.burst)
+            if wait:
+                self._count("throttled")
+                return 429, math.ceil(wait)
+        if not self.limiters[route_class].acquire():
+            self._count("shed")
+            return 503, math.ceil(self.limiters[route_class].max_queue_time)
+        self._count("admitted")
+        return 0, 0
+
+    def release(self, route_class):
+        """
+        Frees the concurrency slot of an admitted request.
+        """
+        self.limiters[route_class].release()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def metrics(self):
+        """
+        Returns admission counters and in-flight requests per route class.
+        """
+        return {
+            **self.counts,
+            "active": {name: limiter.active for name, limiter in self.limiters.items()},
+        }
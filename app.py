@@ -2,10 +2,27 @@
 Flask Application
 """
 
-from dataclasses import fields
-from flask import Flask, jsonify, request
+import hashlib
+import os
+from dataclasses import asdict, fields, replace
+from functools import wraps
+from flask import Flask, Response, g, jsonify, request
+from admission import AdmissionController, MemoryBuckets, SharedBuckets
+from changes import ChangeFeed
+from idempotency import IdempotencyCache
 from models import Experience, Education, Skill
-from utils import validate_data
+from render import FORMATS, render_document, render_pdf
+from shared_store import SharedStore, StoreFullError
+from singleflight import SingleFlight
+from skill_index import SkillIndex, clean_name, normalize_name
+from versioned_store import VersionedStore
+from utils import (
+    apply_json_patch,
+    apply_merge_patch,
+    etag_matches,
+    record_etag,
+    validate_data,
+)
 
 app = Flask(__name__)
 
@@ -33,6 +50,136 @@ data = {
     "skill": [Skill("Python", "1-2 Years", "example-logo.png")],
 }
 
+MODELS = {"experience": Experience, "education": Education, "skill": Skill}
+
+# Share one copy of the data between all workers on a host when configured,
+# otherwise keep a history of versions in memory
+shared_store = (
+    SharedStore(os.environ["RESUME_SHARED_STORE"], MODELS)
+    if os.environ.get("RESUME_SHARED_STORE")
+    else None
+)
+versions = None if shared_store else VersionedStore()
+data = shared_store.attach(data) if shared_store else versions.attach(data)
+
+changes = ChangeFeed()
+skill_names = SkillIndex(item.name for item in data["skill"])
+# Shared store version skill_names is up to date with, or None while this
+# worker changes it; other workers' writes only show up as a new version
+skill_names_version = {"version": shared_store.version if shared_store else None}
+reads = SingleFlight()
+idempotency = IdempotencyCache(path=os.environ.get("IDEMPOTENCY_CACHE_PATH"))
+admission = AdmissionController(
+    rate=float(os.environ.get("RATE_LIMIT", 0)) or None,
+    burst=float(os.environ.get("RATE_LIMIT_BURST", 0)) or None,
+    buckets=(
+        SharedBuckets(os.environ["RATE_LIMIT_SHARED_PATH"])
+        if os.environ.get("RATE_LIMIT_SHARED_PATH")
+        else MemoryBuckets()
+    ),
+)
+# Header carrying the client identity, only to be set when a trusted proxy
+# overwrites it; clients are otherwise identified by their address
+RATE_LIMIT_CLIENT_HEADER = os.environ.get("RATE_LIMIT_CLIENT_HEADER")
+
+SECTION = "<any(experience, education, skill):section>"
+
+# Minimum similarity for ?dedupe=merge to reuse an existing skill
+SKILL_MERGE_THRESHOLD = 0.8
+
+
+@app.before_request
+def admit_request():
+    """
+    Applies the per-client rate limit and the read/write concurrency limits.
+
+    Clients are identified by their address, or by the header named in
+    RATE_LIMIT_CLIENT_HEADER when that is configured.
+
+    Returns
+    -------
+    Response or None
+        429 or 503 response with Retry-After if the request is refused,
+        otherwise None.
+    """
+    route_class = "read" if request.method in ("GET", "HEAD", "OPTIONS") else "write"
+    client = request.remote_addr or ""
+    if RATE_LIMIT_CLIENT_HEADER:
+        client = request.headers.get(RATE_LIMIT_CLIENT_HEADER) or client
+    status, retry_after = admission.admit(client, route_class)
+    if status:
+        error = "Too many requests" if status == 429 else "Server busy"
+        response = jsonify({"error": error})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, status
+    g.route_class = route_class
+    return None
+
+
+@app.before_request
+def pin_snapshot():
+    """
+    Pins the store version that all reads in this request will see.
+
+    GET requests may pass `as_of` to read a past version.
+
+    Returns
+    -------
+    Response or None
+        Error response if `as_of` is invalid, otherwise None.
+    """
+    if versions is None:
+        return None
+
+    snapshot = None
+    if "as_of" in request.args:
+        if request.method != "GET":
+            return jsonify({"error": "as_of is only supported on GET"}), 400
+        try:
+            snapshot = versions.at(int(request.args["as_of"]))
+        except ValueError:
+            return jsonify({"error": "Invalid as_of parameter"}), 400
+        if snapshot is None:
+            return jsonify({"error": "Version not available"}), 404
+    g.snapshot_token = versions.pin(snapshot)
+    return None
+
+
+@app.after_request
+def add_version_header(response):
+    """
+    Reports the store version the request saw (or produced).
+    """
+    if versions is not None:
+        response.headers["X-Resume-Version"] = str(versions.pinned()[0])
+    return response
+
+
+@app.teardown_request
+def release_request(_exc):
+    """
+    Releases the snapshot and concurrency slot held by this request.
+    """
+    token = g.pop("snapshot_token", None)
+    if token is not None:
+        versions.unpin(token)
+    route_class = g.pop("route_class", None)
+    if route_class is not None:
+        admission.release(route_class)
+
+
+@app.errorhandler(StoreFullError)
+def store_full(_error):
+    """
+    Reports that the shared store has no room left for a write.
+
+    Returns
+    -------
+    Response
+        507 response with an error message.
+    """
+    return jsonify({"error": "Insufficient storage"}), 507
+
 
 @app.route("/test")
 def hello_world():
@@ -47,7 +194,136 @@ def hello_world():
     return jsonify({"message": "Hello, World!"})
 
 
+def shared_json(compute):
+    """
+    Builds a JSON response, coalescing identical concurrent reads.
+
+    Concurrent requests for the same path and query at the same store
+    version wait for a single call to compute() and share its encoding.
+    The version is the one the request has pinned, or with the shared
+    store the version seen across all workers.
+
+    Parameters
+    ----------
+    compute : callable
+        Returns the object to serialize.
+
+    Returns
+    -------
+    Response
+        JSON response with the encoded result.
+    """
+    version = versions.pinned()[0] if versions else shared_store.version
+    key = (request.path, request.query_string, version)
+    body = reads.do(key, lambda: app.json.dumps(compute()))
+    return app.response_class(body, mimetype="application/json")
+
+
+def idempotent(view):
+    """
+    Makes POST requests carrying an Idempotency-Key header safe to retry.
+
+    The first response for a key is stored and replayed for later requests
+    with the same key and body, without calling the view again. Reusing a
+    key with a different body returns 422. A retry arriving while the
+    first request is still being handled waits for it instead of inserting.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if request.method != "POST" or not key:
+            return view(*args, **kwargs)
+
+        cache_key = f"{request.path} {key}"
+        fingerprint = hashlib.sha1(
+            request.query_string + b"\0" + request.get_data()
+        ).hexdigest()
+        stored = idempotency.begin(cache_key)
+        if stored is None:
+            value = None
+            try:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code < 500:
+                    value = {
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "body": response.get_data(as_text=True),
+                    }
+            finally:
+                idempotency.finish(cache_key, value)
+            return response
+
+        if stored["fingerprint"] != fingerprint:
+            return jsonify({"error": "Idempotency-Key reused with a different request"}), 422
+        response = app.response_class(
+            stored["body"], status=stored["status"], mimetype="application/json"
+        )
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    return wrapper
+
+
+def parse_ids(raw_ids):
+    """
+    Parses a list of entry IDs from a comma-separated string or JSON list.
+
+    Parameters
+    ----------
+    raw_ids : str or list
+        The IDs to parse.
+
+    Returns
+    -------
+    list
+        The IDs as integers, in the given order without duplicates.
+
+    Raises
+    ------
+    ValueError
+        If any ID is not an integer.
+    """
+    if isinstance(raw_ids, str):
+        raw_ids = [int(raw_id) for raw_id in raw_ids.split(",") if raw_id.strip()]
+    if not isinstance(raw_ids, list):
+        raise ValueError("ids must be a list")
+    if any(not isinstance(raw_id, int) or isinstance(raw_id, bool) for raw_id in raw_ids):
+        raise ValueError("ids must be integers")
+    return list(dict.fromkeys(raw_ids))
+
+
+def get_many(section):
+    """
+    Returns the entries of a section listed in the `ids` query parameter.
+
+    Parameters
+    ----------
+    section : str
+        The resume section ('experience', 'education' or 'skill').
+
+    Returns
+    -------
+    Response
+        JSON with the found entries and the IDs that were not found.
+        Returns 400 if `ids` is not a comma-separated list of integers.
+    """
+    try:
+        ids = parse_ids(request.args["ids"])
+    except ValueError:
+        return jsonify({"error": "Invalid ids parameter"}), 400
+
+    def compute():
+        items = data[section]
+        found = [{"id": i, "data": items[i]} for i in ids if 0 <= i < len(items)]
+        missing = [i for i in ids if not 0 <= i < len(items)]
+        return {"items": found, "missing": missing}
+
+    return shared_json(compute), 200
+
+
 @app.route("/resume/experience", methods=["GET", "POST"])
+@idempotent
 def experience():
     """
     Handles experience data requests.
@@ -63,7 +339,9 @@ def experience():
         Returns 405 if method is not allowed.
     """
     if request.method == "GET":
-        return jsonify(data["experience"]), 200
+        if "ids" in request.args:
+            return get_many("experience")
+        return shared_json(lambda: list(data["experience"])), 200
 
     if request.method == "POST":
         try:
@@ -80,8 +358,14 @@ def experience():
                 experience_data["description"],
                 experience_data["logo"],
             )
-            data["experience"].append(new_experience)
-            return jsonify({"id": len(data["experience"]) - 1}), 201
+
+            def insert(items):
+                items.append(new_experience)
+                changes.publish("experience", "insert", len(items) - 1, new_experience)
+                return len(items) - 1
+
+            item_id = data["experience"].update(insert)
+            return jsonify({"id": item_id}), 201
         except (TypeError, ValueError, KeyError):
             return jsonify({"error": "Invalid data format"}), 400
 
@@ -105,7 +389,9 @@ def get_experience_by_index(index):
     """
     try:
         experience_item = data["experience"][index]
-        return jsonify(experience_item)
+        response = jsonify(experience_item)
+        response.headers["ETag"] = record_etag(asdict(experience_item))
+        return response
     except IndexError:
         return jsonify({"error": "Experience not found"}), 404
 
@@ -131,25 +417,34 @@ def update_experience(item_id):
     if not content:
         return jsonify({"error": "Invalid request"}), 400
 
-    if 0 <= item_id < len(data["experience"]):
+    valid_keys = {f.name for f in fields(Experience)}
+    filtered_content = {k: v for k, v in content.items() if k in valid_keys}
+
+    def put(items):
+        # Checks the index against the entries the change replaces
+        if not 0 <= item_id < len(items):
+            return {"error": "Experience not found"}, 404
         try:
-            valid_keys = {f.name for f in fields(Experience)}
-            filtered_content = {k: v for k, v in content.items() if k in valid_keys}
-            data["experience"][item_id] = Experience(**filtered_content)
-            return jsonify({"message": "Experience updated successfully"}), 200
+            items[item_id] = Experience(**filtered_content)
         except TypeError as e:
-            return jsonify({"error": f"Missing or invalid fields: {str(e)}"}), 400
+            return {"error": f"Missing or invalid fields: {str(e)}"}, 400
+        changes.publish("experience", "update", item_id, items[item_id])
+        return {"message": "Experience updated successfully"}, 200
 
-    return jsonify({"error": "Experience not found"}), 404
+    body, status = data["experience"].update(put)
+    return jsonify(body), status
 
 
 @app.route("/resume/education", methods=["GET", "POST"])
+@idempotent
 def education():
     """
     Handles education requests
     """
     if request.method == "GET":
-        return jsonify(data["education"]), 200
+        if "ids" in request.args:
+            return get_many("education")
+        return shared_json(lambda: list(data["education"])), 200
 
     if request.method == "POST":
         try:
@@ -179,12 +474,21 @@ def education_by_index(index):
     if request.method == "GET":
         try:
             education_item = data["education"][index]
-            return jsonify(education_item)
+            response = jsonify(education_item)
+            response.headers["ETag"] = record_etag(asdict(education_item))
+            return response
         except IndexError:
             return jsonify({"error": "Education not found"}), 404
     if request.method == "DELETE":
-        if 0 <= index < len(data["education"]):
-            data["education"].pop(index)
+
+        def delete(items):
+            if not 0 <= index < len(items):
+                return False
+            del items[index]
+            changes.publish("education", "delete", index)
+            return True
+
+        if data["education"].update(delete):
             return jsonify({"message": "Education has been deleted"}), 200
         return jsonify({"error": "400 Bad Request"}), 400
     return jsonify({"error": "Method not allowed"}), 405
@@ -211,34 +515,46 @@ def update_education(item_id):
     if not content:
         return jsonify({"error": "Invalid request"}), 400
 
-    if 0 <= item_id < len(data["education"]):
+    valid_keys = {f.name for f in fields(Education)}
+    filtered_content = {k: v for k, v in content.items() if k in valid_keys}
+
+    def put(items):
+        # Checks the index against the entries the change replaces
+        if not 0 <= item_id < len(items):
+            return {"error": "Education not found"}, 404
         try:
-            valid_keys = {f.name for f in fields(Education)}
-            filtered_content = {k: v for k, v in content.items() if k in valid_keys}
-            data["education"][item_id] = Education(**filtered_content)
-            return jsonify({"message": "Education updated successfully"}), 200
+            items[item_id] = Education(**filtered_content)
         except TypeError as e:
-            return jsonify({"error": f"Missing or invalid fields: {str(e)}"}), 400
+            return {"error": f"Missing or invalid fields: {str(e)}"}, 400
+        changes.publish("education", "update", item_id, items[item_id])
+        return {"message": "Education updated successfully"}, 200
 
-    return jsonify({"error": "Education not found"}), 404
+    body, status = data["education"].update(put)
+    return jsonify(body), status
 
 
 @app.route("/resume/skill", methods=["GET", "POST"])
+@idempotent
 def skill():
     """
     Handles skill data requests.
 
     GET: Returns all stored skill entries.
-    POST: Adds a new skill entry (to be implemented).
+    POST: Adds a new skill entry with its name tidied. Near-duplicate
+    existing skills are listed under "similar"; with ?dedupe=merge the
+    closest one is returned instead if it is similar enough.
 
     Returns
     -------
     Response
-        JSON of skill data (or empty placeholder) on GET.
+        JSON of skill data on GET, or the new (or merged) entry's ID on POST.
+        Returns 400 if required fields are missing in POST.
         Returns 405 if method is not allowed.
     """
     if request.method == "GET":
-        return jsonify(data["skill"]), 200
+        if "ids" in request.args:
+            return get_many("skill")
+        return shared_json(lambda: list(data["skill"])), 200
 
     # if request.method == "POST":
     #     try:
@@ -260,15 +576,399 @@ def skill():
         if not all(key in experience_data for key in ["name", "proficiency", "logo"]):
             return jsonify({"error": "Missing required fields"}), 400
 
-        data["skill"].append(
-            Skill(
-                request.json["name"], request.json["proficiency"], request.json["logo"]
-            )
-        )
-        return jsonify({"id": len(data["skill"]) - 1}), 201
+        if not isinstance(experience_data["name"], str) or not experience_data["name"].strip():
+            return jsonify({"error": "Invalid data format"}), 400
+        name = clean_name(experience_data["name"])
+        merge = request.args.get("dedupe") == "merge"
+
+        def insert(items):
+            names = changing_skill_names(items)
+            similar = names.similar(name)
+            if merge and similar and similar[0]["score"] >= SKILL_MERGE_THRESHOLD:
+                return {"id": similar[0]["ids"][0], "merged": True}, 200
+            items.append(Skill(name, experience_data["proficiency"], experience_data["logo"]))
+            item_id = len(items) - 1
+            names.add(name, item_id)
+            changes.publish("skill", "insert", item_id, items[item_id])
+            body = {"id": item_id}
+            if similar:
+                body["similar"] = similar
+            return body, 201
+
+        body, status = data["skill"].update(insert)
+        skill_names_changed()
+        return jsonify(body), status
 
     return jsonify({"error": "Method not allowed"}), 405
 
 
+@app.route("/resume/skill/<int:index>", methods=["GET"])
+def get_skill_by_index(index):
+    """
+    Retrieves a skill entry by index.
+
+    Parameters
+    ----------
+    index : int
+        The index of the skill entry to retrieve.
+
+    Returns
+    -------
+    Response
+        JSON of the skill entry with its ETag if found, otherwise 404 error.
+    """
+    try:
+        skill_item = data["skill"][index]
+        response = jsonify(skill_item)
+        response.headers["ETag"] = record_etag(asdict(skill_item))
+        return response
+    except IndexError:
+        return jsonify({"error": "Skill not found"}), 404
+
+
+@app.route("/resume/skill/similar", methods=["GET"])
+def similar_skills():
+    """
+    Finds stored skills with names similar to the `name` query parameter.
+
+    The optional `threshold` (0 to 1, default 0.5) and `limit` (default 10)
+    parameters control which matches are returned.
+
+    Returns
+    -------
+    Response
+        JSON with the normalized name and the matches, most similar first.
+        Returns 400 if the parameters are missing or invalid.
+    """
+    name = request.args.get("name", "")
+    try:
+        threshold = float(request.args.get("threshold", 0.5))
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "Invalid threshold or limit"}), 400
+    if not name.strip() or not 0 < threshold <= 1 or limit < 1:
+        return jsonify({"error": "Invalid request"}), 400
+
+    if shared_store and skill_names_version["version"] != shared_store.version:
+        data["skill"].update(refresh_skill_names)
+    matches = skill_names.similar(name, threshold, limit)
+    return jsonify({"normalized": normalize_name(name), "matches": matches}), 200
+
+
+def refresh_skill_names(items):
+    """
+    Rebuilds skill_names if other workers have changed the shared skills.
+
+    Must be called from an update() callback on the skills, so that no
+    write can interleave; items are the skills that callback received.
+    """
+    if shared_store and skill_names_version["version"] != shared_store.version:
+        skill_names.rebuild(item.name for item in items)
+        skill_names_version["version"] = shared_store.version
+
+
+def changing_skill_names(items):
+    """
+    Returns skill_names, up to date, for an update() callback to change.
+
+    Call skill_names_changed() once the update() has returned.
+    """
+    refresh_skill_names(items)
+    skill_names_version["version"] = None
+    return skill_names
+
+
+def skill_names_changed():
+    """
+    Records that skill_names matches the skills this thread just wrote,
+    if the update changed it.
+    """
+    if shared_store and skill_names_version["version"] is None:
+        skill_names_version["version"] = shared_store.last_write
+
+
+@app.route(f"/resume/{SECTION}/delete", methods=["POST"])
+def delete_many(section):
+    """
+    Deletes several entries of a section at once.
+
+    The request body is a JSON object with an "ids" list. Either all of the
+    entries are deleted or, if any ID is not found, none of them are.
+    Remaining entries are renumbered as with single deletes.
+
+    Parameters
+    ----------
+    section : str
+        The resume section ('experience', 'education' or 'skill').
+
+    Returns
+    -------
+    Response
+        JSON with the number of deleted entries.
+        Returns 404 with the missing IDs if any entry is not found.
+        Returns 400 if the request is invalid.
+    """
+    content = request.get_json(silent=True)
+    try:
+        ids = parse_ids(content["ids"])
+    except (TypeError, ValueError, KeyError):
+        return jsonify({"error": "Invalid request"}), 400
+
+    removed = set(ids)
+
+    def delete(items):
+        missing = [i for i in ids if not 0 <= i < len(items)]
+        if missing:
+            return missing
+        if section == "skill":
+            names = changing_skill_names(items)
+            for item_id in removed:
+                names.discard(items[item_id].name, item_id)
+            names.renumber(removed)
+        items[:] = [item for i, item in enumerate(items) if i not in removed]
+        for item_id in sorted(removed, reverse=True):
+            changes.publish(section, "delete", item_id)
+        return []
+
+    missing = data[section].update(delete)
+    if section == "skill":
+        skill_names_changed()
+    if missing:
+        return jsonify({"error": "Entries not found", "missing": missing}), 404
+    return jsonify({"deleted": len(removed)}), 200
+
+
+def patched_record(section, current, content, json_patch):
+    """
+    Applies a patch document to an entry's fields.
+
+    Parameters
+    ----------
+    section : str
+        The resume section the entry belongs to.
+    current : dict
+        The entry's current fields.
+    content : dict or list
+        The merge patch or JSON Patch document.
+    json_patch : bool
+        Whether content is a JSON Patch rather than a merge patch.
+
+    Returns
+    -------
+    dict
+        The patched fields, without fields unknown to the model.
+
+    Raises
+    ------
+    ValueError
+        If the patch cannot be applied, leaves required fields missing or
+        sets an invalid skill name.
+    """
+    if json_patch:
+        patched = apply_json_patch(current, content)
+    else:
+        patched = apply_merge_patch(current, content)
+
+    valid_keys = {f.name for f in fields(MODELS[section])}
+    patched = {k: v for k, v in patched.items() if k in valid_keys}
+    is_valid, error_message = validate_data(section, patched)
+    if not is_valid:
+        raise ValueError(error_message)
+    if section == "skill":
+        if not isinstance(patched["name"], str) or not patched["name"].strip():
+            raise ValueError("Invalid data format")
+        patched["name"] = clean_name(patched["name"])
+    return patched
+
+
+@app.route(f"/resume/{SECTION}/<int:item_id>", methods=["PATCH"])
+def patch_item(section, item_id):
+    """
+    Partially update an entry in place.
+
+    The request body is applied as an RFC 6902 JSON Patch when sent as
+    application/json-patch+json, otherwise as an RFC 7396 JSON Merge Patch.
+    An If-Match header makes the update conditional on the entry's ETag.
+    Sending "Prefer: return=minimal" returns only the fields that changed.
+
+    Parameters
+    ----------
+    section : str
+        The resume section ('experience', 'education' or 'skill').
+    item_id : int
+        The index of the entry to update.
+
+    Returns
+    -------
+    Response
+        JSON of the updated entry (or of its changed fields) with its new ETag.
+        Returns 404 if the entry is not found.
+        Returns 412 if the If-Match precondition fails.
+        Returns 400 if the patch is invalid or leaves required fields missing.
+    """
+    content = request.get_json(force=True, silent=True)
+    json_patch = request.mimetype == "application/json-patch+json"
+    if_match = request.headers.get("If-Match")
+
+    def patch(items):
+        # Runs under the store's write lock so that the precondition is
+        # checked against the entry that the change replaces
+        if not 0 <= item_id < len(items):
+            return 404, {"error": f"{section.capitalize()} not found"}, None, None
+        current = asdict(items[item_id])
+        etag = record_etag(current)
+        if if_match is not None and not etag_matches(if_match, etag):
+            return 412, {"error": "Precondition failed"}, None, None
+        try:
+            patched = patched_record(section, current, content, json_patch)
+        except ValueError as e:
+            return 400, {"error": str(e)}, None, None
+
+        changed = {k: v for k, v in patched.items() if current.get(k) != v}
+        if not changed:
+            return 200, {}, items[item_id], etag
+        items[item_id] = replace(items[item_id], **changed)
+        if section == "skill" and "name" in changed:
+            names = changing_skill_names(items)
+            names.discard(current["name"], item_id)
+            names.add(items[item_id].name, item_id)
+        changes.publish(section, "update", item_id, items[item_id])
+        return 200, changed, items[item_id], record_etag(patched)
+
+    status, body, item, etag = data[section].update(patch)
+    if section == "skill":
+        skill_names_changed()
+    if status != 200:
+        return jsonify(body), status
+
+    if request.headers.get("Prefer", "").strip() == "return=minimal":
+        response = jsonify(body)
+    else:
+        response = jsonify(item)
+    response.headers["ETag"] = etag
+    return response, 200
+
+
+@app.route("/resume/changes", methods=["GET"])
+def resume_changes():
+    """
+    Feed of inserts, updates and deletes across all resume sections.
+
+    Clients accepting text/event-stream receive a Server-Sent Events stream
+    starting after the `since` query parameter or the Last-Event-ID header
+    (or from now if neither is given). Other clients get the buffered
+    events after `since` as JSON. A reset flag (or "reset" event) means the
+    requested events are no longer buffered and the client should reload.
+
+    Returns
+    -------
+    Response
+        SSE stream, or JSON with the events, reset flag and latest sequence.
+        Returns 400 if `since` is not an integer.
+    """
+    since = request.args.get("since", request.headers.get("Last-Event-ID"))
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return jsonify({"error": "Invalid since parameter"}), 400
+
+    if request.accept_mimetypes.best == "text/event-stream":
+        return Response(
+            changes.stream(changes.seq if since is None else since),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    events, reset = changes.since(since or 0)
+    return jsonify({"events": events, "reset": reset, "seq": changes.seq}), 200
+
+
+@app.route(f"/resume/{SECTION}/<int:item_id>/history", methods=["GET"])
+def item_history(section, item_id):
+    """
+    Lists the retained versions of an entry.
+
+    Entries are identified by index, so an entry's history also reflects
+    other entries moving into its index after deletes.
+
+    Parameters
+    ----------
+    section : str
+        The resume section ('experience', 'education' or 'skill').
+    item_id : int
+        The index of the entry.
+
+    Returns
+    -------
+    Response
+        JSON list of the versions at which the entry changed, with its
+        contents (null when no entry had that index).
+        Returns 404 if no retained version has the entry.
+        Returns 501 if the store does not keep history.
+    """
+    if versions is None:
+        return jsonify({"error": "History is not available"}), 501
+
+    changes_seen = []
+    previous = None
+    for version, sections in versions.history():
+        items = sections[section]
+        item = items[item_id] if item_id < len(items) else None
+        if not changes_seen or item is not previous:
+            changes_seen.append({"version": version, "data": item})
+        previous = item
+
+    if all(change["data"] is None for change in changes_seen):
+        return jsonify({"error": f"{section.capitalize()} not found"}), 404
+    return jsonify(changes_seen), 200
+
+
+@app.route("/resume/render", methods=["GET"])
+def render_resume():
+    """
+    Renders the whole resume server-side.
+
+    The `format` query parameter selects 'html' (the default), 'md' or
+    'pdf'. Each entry's fragment is cached by version, so only edited
+    entries are re-rendered. PDFs are laid out in a worker process.
+
+    Returns
+    -------
+    Response
+        The rendered document.
+        Returns 400 if the format is not supported.
+        Returns 503 if a PDF could not be rendered in time.
+    """
+    fmt = request.args.get("format", "html")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+
+    sections = {section: list(items) for section, items in data.items()}
+    if fmt == "pdf":
+        body = render_pdf(sections)
+        if body is None:
+            response = jsonify({"error": "PDF rendering unavailable"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+    else:
+        body = render_document(fmt, sections)
+    return app.response_class(body, mimetype=FORMATS[fmt]), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Returns operational counters.
+
+    Returns
+    -------
+    Response
+        JSON with the read coalescing and admission counters.
+    """
+    return jsonify(
+        {"single_flight": reads.metrics(), "admission": admission.metrics()}
+    ), 200
+
+
 if __name__ == "__main__":
     app.run()
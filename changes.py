@@ -0,0 +1,116 @@
+"""
+Change feed for resume mutations, kept in a bounded ring buffer.
+"""
+
+import json
+import threading
+from collections import deque
+from dataclasses import asdict
+
+
+class ChangeFeed:
+    """
+    Sequenced log of the most recent inserts, updates and deletes.
+
+    Writers never wait on readers: publishing appends to a fixed-size
+    buffer and wakes any waiting streams. Readers that fall further behind
+    than the buffer holds are told to reload instead of replaying.
+    """
+
+    def __init__(self, capacity=1000):
+        self._events = deque(maxlen=capacity)
+        self._seq = 0
+        self._condition = threading.Condition()
+
+    @property
+    def seq(self):
+        """
+        The sequence number of the latest published event.
+        """
+        return self._seq
+
+    def publish(self, section, op, item_id, item=None):
+        """
+        Records a mutation and wakes waiting readers.
+
+        Parameters
+        ----------
+        section : str
+            The resume section that changed.
+        op : str
+            One of 'insert', 'update' or 'delete'.
+        item_id : int
+            The index of the affected entry.
+        item : dataclass, optional
+            The entry after the change; omitted for deletes.
+
+        Returns
+        -------
+        int
+            The sequence number assigned to the event.
+        """
+        with self._condition:
+            self._seq += 1
+            self._events.append(
+                {
+                    "seq": self._seq,
+                    "section": section,
+                    "op": op,
+                    "id": item_id,
+                    "data": asdict(item) if item is not None else None,
+                }
+            )
+            self._condition.notify_all()
+            return self._seq
+
+    def since(self, seq):
+        """
+        Returns the events published after a sequence number.
+
+        Parameters
+        ----------
+        seq : int
+            The last sequence number the client has seen.
+
+        Returns
+        -------
+        tuple
+            (list, bool) - (events, reset) where reset is True if events
+            after seq have already been evicted (or seq is unknown) and
+            the client must reload.
+        """
+        with self._condition:
+            events = [event for event in self._events if event["seq"] > seq]
+            oldest = self._events[0]["seq"] if self._events else self._seq + 1
+            return events, not oldest - 1 <= seq <= self._seq
+
+    def wait(self, seq, timeout=None):
+        """
+        Blocks until an event newer than seq is published or timeout expires.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > seq, timeout)
+
+    def stream(self, seq, keepalive=15):
+        """
+        Yields Server-Sent Events for every change after seq, forever.
+
+        Parameters
+        ----------
+        seq : int
+            The last sequence number the client has seen.
+        keepalive : float
+            Seconds of inactivity after which a comment line is sent.
+        """
+        while True:
+            events, reset = self.since(seq)
+            if reset:
+                seq = self._seq
+                yield f"id: {seq}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            for event in events:
+                seq = event["seq"]
+                yield f"id: {seq}\nevent: {event['op']}\ndata: {json.dumps(event)}\n\n"
+            if not events:
+                yield ": keepalive\n\n"
+            self.wait(seq, keepalive)
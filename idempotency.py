@@ -0,0 +1,168 @@
+# pylint: disable=R0902
+
+"""
+Bounded, expiring cache of responses keyed by Idempotency-Key.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class IdempotencyCache:
+    """
+    Maps idempotency keys to the response first returned for them.
+
+    Entries expire after `ttl` seconds and at most `max_entries` are kept,
+    evicting the oldest first. Lookups and inserts are O(1). If `path` is
+    given, entries are appended to that file and reloaded on start-up;
+    the file is compacted once it holds twice `max_entries` lines. Several
+    processes may share the file: writes to it are serialized with a lock
+    file, and compacting keeps the entries other processes appended.
+    """
+
+    def __init__(self, max_entries=10000, ttl=24 * 60 * 60, path=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.RLock()
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lines = 0
+        self._in_flight = {}
+        self._lock_file = None
+        if path:
+            self._lock_file = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            self._compact()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the stored entry for key, or None if absent or expired.
+        """
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(key)
+            return entry["value"] if entry else None
+
+    def begin(self, key):
+        """
+        Claims a key before handling its request.
+
+        Waits while another request with the same key is being handled.
+        Requests with other keys are not held up.
+
+        Returns
+        -------
+        object or None
+            The stored value if the key was already handled; otherwise
+            None, and the caller must call finish() for the key.
+        """
+        while True:
+            with self._lock:
+                stored = self.get(key)
+                if stored is not None:
+                    return stored
+                event = self._in_flight.get(key)
+                if event is None:
+                    self._in_flight[key] = threading.Event()
+                    return None
+            event.wait()
+
+    def finish(self, key, value=None):
+        """
+        Releases a key claimed by begin(), storing value unless it is None.
+        """
+        with self._lock:
+            if value is not None:
+                self.put(key, value)
+            self._in_flight.pop(key).set()
+
+    def put(self, key, value):
+        """
+        Stores a JSON-serializable value for key.
+        """
+        with self._lock:
+            entry = {"key": key, "expires": self._clock() + self.ttl, "value": value}
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            self._evict()
+            if self.path:
+                with self._file_locked():
+                    with open(self.path, "a", encoding="utf-8") as file:
+                        file.write(json.dumps(entry) + "\n")
+                self._lines += 1
+                if self._lines > 2 * self.max_entries:
+                    self._compact()
+
+    def _evict(self):
+        """
+        Drops expired entries and the oldest entries beyond max_entries.
+        """
+        now = self._clock()
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest["expires"] > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    @contextmanager
+    def _file_locked(self):
+        """
+        Holds the lock shared by all processes using the persistence file.
+        """
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _merge(self, file):
+        """
+        Adds the entries in file, keeping the later of two for the same key.
+        """
+        for line in file:
+            try:
+                entry = json.loads(line)
+                if not isinstance(entry["expires"], (int, float)):
+                    continue
+                current = self._entries.get(entry["key"])
+                if current is None or current["expires"] < entry["expires"]:
+                    self._entries[entry["key"]] = entry
+            except (ValueError, KeyError, TypeError):
+                continue
+        self._entries = OrderedDict(
+            sorted(self._entries.items(), key=lambda item: item[1]["expires"])
+        )
+
+    def _compact(self):
+        """
+        Rewrites the persistence file with only the live entries.
+
+        Entries appended by other processes are merged in first, so that
+        compacting does not lose them.
+        """
+        with self._lock, self._file_locked():
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as file:
+                    self._merge(file)
+            self._evict()
+            fd, temporary = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp"
+            )
+            try:
+                with open(fd, "w", encoding="utf-8") as file:
+                    for entry in self._entries.values():
+                        file.write(json.dumps(entry) + "\n")
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+            self._lines = len(self._entries)
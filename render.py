@@ -0,0 +1,300 @@
+"""
+Server-side rendering of the resume as HTML, Markdown or PDF.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from functools import cache
+from jinja2 import Environment
+from markupsafe import Markup
+from utils import record_etag
+
+FORMATS = {
+    "html": "text/html",
+    "md": "text/markdown",
+    "pdf": "application/pdf",
+}
+
+TITLES = {"experience": "Experience", "education": "Education", "skill": "Skills"}
+
+# Helvetica advance widths of " " to "~", in thousandths of the font size
+_HELVETICA_WIDTHS = (
+    (278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278)
+    + (556,) * 10
+    + (278, 278, 584, 584, 584, 556, 1015)
+    + (667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833)
+    + (722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611)
+    + (278, 278, 278, 469, 556, 333)
+    + (556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833)
+    + (556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500)
+    + (334, 260, 334, 584)
+)
+# Width between the 50pt margins of an A4 page, at 11pt
+_LINE_WIDTH = (595 - 2 * 50) * 1000 / 11
+
+# Compiled once at import; only the per-entry fragments are rendered per request
+_TEMPLATES = {
+    "html": {
+        "experience": "<article><h3>{{ title }} &middot; {{ company }}</h3>"
+        "<p><small>{{ start_date }} &ndash; {{ end_date }}</small></p>"
+        "<p>{{ description }}</p></article>",
+        "education": "<article><h3>{{ course }} &middot; {{ school }}</h3>"
+        "<p><small>{{ start_date }} &ndash; {{ end_date }}</small></p>"
+        "<p>Grade: {{ grade }}</p></article>",
+        "skill": "<li>{{ name }} ({{ proficiency }})</li>",
+        "section": "<section><h2>{{ title }}</h2>{{ body }}</section>",
+        "page": "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        "<title>Resume</title></head><body>{{ body }}</body></html>",
+    },
+    "md": {
+        "experience": "### {{ title }} - {{ company }}\n"
+        "_{{ start_date }} - {{ end_date }}_\n\n{{ description }}\n",
+        "education": "### {{ course }} - {{ school }}\n"
+        "_{{ start_date }} - {{ end_date }}_\n\nGrade: {{ grade }}\n",
+        "skill": "- {{ name }} ({{ proficiency }})",
+        "section": "## {{ title }}\n\n{{ body }}\n",
+        "page": "# Resume\n\n{{ body }}",
+    },
+    # Plain text laid out as PDF
+    "text": {
+        "experience": "{{ title }}, {{ company }}\n"
+        "{{ start_date }} - {{ end_date }}\n{{ description }}\n",
+        "education": "{{ course }}, {{ school }}\n"
+        "{{ start_date }} - {{ end_date }}\nGrade: {{ grade }}\n",
+        "skill": "- {{ name }} ({{ proficiency }})",
+        "section": "{{ title|upper }}\n\n{{ body }}\n",
+        "page": "RESUME\n\n{{ body }}",
+    },
+}
+
+_environments = {
+    "html": Environment(autoescape=True),
+    "md": Environment(),
+    "text": Environment(),
+}
+TEMPLATES = {
+    fmt: {name: _environments[fmt].from_string(source) for name, source in sources.items()}
+    for fmt, sources in _TEMPLATES.items()
+}
+
+FRAGMENT_CACHE_SIZE = 4096
+
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+
+
+def render_fragment(fmt, section, item):
+    """
+    Renders one entry, reusing the cached fragment for its current version.
+
+    Parameters
+    ----------
+    fmt : str
+        'html', 'md' or 'text'.
+    section : str
+        The resume section the entry belongs to.
+    item : dataclass
+        The entry to render.
+
+    Returns
+    -------
+    str
+        The rendered fragment.
+    """
+    record = asdict(item)
+    key = (fmt, section, record_etag(record))
+    with _fragments_lock:
+        fragment = _fragments.get(key)
+        if fragment is not None:
+            _fragments.move_to_end(key)
+            return fragment
+
+    fragment = TEMPLATES[fmt][section].render(record)
+    with _fragments_lock:
+        _fragments[key] = fragment
+        if len(_fragments) > FRAGMENT_CACHE_SIZE:
+            _fragments.popitem(last=False)
+    return fragment
+
+
+def render_document(fmt, sections):
+    """
+    Renders a whole resume from its sections.
+
+    Parameters
+    ----------
+    fmt : str
+        'html', 'md' or 'text'.
+    sections : dict
+        Maps each section name to its entries.
+
+    Returns
+    -------
+    str
+        The rendered document.
+    """
+    templates = TEMPLATES[fmt]
+    separator = "" if fmt == "html" else "\n"
+    rendered = []
+    for section, items in sections.items():
+        body = separator.join(render_fragment(fmt, section, item) for item in items)
+        if fmt == "html":
+            body = Markup(f"<ul>{body}</ul>" if section == "skill" else body)
+        rendered.append(templates["section"].render(title=TITLES[section], body=body))
+    body = separator.join(rendered)
+    return templates["page"].render(body=Markup(body) if fmt == "html" else body)
+
+
+def render_pdf(sections, timeout=30):
+    """
+    Renders a resume as PDF in a worker process.
+
+    Parameters
+    ----------
+    sections : dict
+        Maps each section name to its entries.
+    timeout : float
+        Seconds to wait for the worker process.
+
+    Returns
+    -------
+    bytes or None
+        The PDF document, or None if it could not be produced in time.
+    """
+    lines = render_document("text", sections).splitlines()
+    for attempt in range(2):
+        pool = _pdf_pool()
+        try:
+            future = pool.submit(text_to_pdf, lines)
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+        except BrokenProcessPool:
+            # A worker died; start a new pool and try once more
+            _pdf_pool.cache_clear()
+            pool.shutdown(wait=False)
+            if attempt:
+                return None
+    return None
+
+
+@cache
+def _pdf_pool():
+    """
+    Returns the process pool used for PDF layout, starting it on first use.
+    """
+    return ProcessPoolExecutor(max_workers=2)
+
+
+def text_width(text):
+    """
+    Returns the width of text set in Helvetica, in thousandths of the font size.
+    """
+    return sum(_HELVETICA_WIDTHS[ord(c) - 32] if " " <= c <= "~" else 556 for c in text)
+
+
+def wrap_line(line, width):
+    """
+    Splits a line into lines no wider than width, breaking between words.
+
+    Continuation lines keep the line's indentation, and words wider than
+    a whole line are broken between characters.
+
+    Parameters
+    ----------
+    line : str
+        The line of text.
+    width : float
+        Maximum width, in thousandths of the font size.
+
+    Returns
+    -------
+    list
+        The wrapped lines.
+    """
+    indent = line[: len(line) - len(line.lstrip(" "))]
+    wrapped, current = [], indent
+    for word in line.split():
+        candidate = f"{current} {word}" if current.strip() else current + word
+        if text_width(candidate) <= width:
+            current = candidate
+            continue
+        if current.strip():
+            wrapped.append(current)
+            current = indent
+        while text_width(current + word) > width and len(word) > 1:
+            cut = len(word) - 1
+            while cut > 1 and text_width(current + word[:cut]) > width:
+                cut -= 1
+            wrapped.append(current + word[:cut])
+            word = word[cut:]
+        current += word
+    wrapped.append(current)
+    return wrapped
+
+
+def text_to_pdf(lines, lines_per_page=50):
+    """
+    Lays out lines of text on A4 pages as a minimal PDF document.
+
+    Lines too wide for the page are wrapped, and characters outside
+    Windows-1252 are replaced.
+
+    Parameters
+    ----------
+    lines : list
+        The lines of text.
+    lines_per_page : int
+        Number of lines on each page.
+
+    Returns
+    -------
+    bytes
+        The PDF document.
+    """
+    lines = [wrapped for line in lines for wrapped in wrap_line(line, _LINE_WIDTH)]
+    pages = [lines[i : i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    pages = pages or [[]]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for page in pages:
+        text = "".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            + ") Tj T* "
+            for line in page
+        )
+        stream = f"BT /F1 11 Tf 14 TL 50 792 Td {text}ET".encode("cp1252", "replace")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids),
+        len(kids),
+    )
+
+    document = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(document))
+        document += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(document)
+    document += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    document += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    document += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(document)
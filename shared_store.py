@@ -0,0 +1,427 @@
+# pylint: disable=R0902
+
+"""
+Resume store shared between worker processes through a memory-mapped file.
+
+The file holds a header followed by an append-only arena of blobs. Each
+record is a JSON blob, and each section's order is an index blob of record
+offsets. Writers append new blobs, then publish them by swapping the index
+offsets in the header under a sequence lock; readers never lock and retry
+if the sequence number changed while they were reading. When compacting
+does not free enough space, the file is grown and every worker remaps it.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import MutableSequence
+from dataclasses import asdict
+
+MAGIC = b"RESUMEv2"
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+
+
+class StoreFullError(Exception):
+    """
+    Raised when the shared store cannot grow to fit a write.
+    """
+
+
+class _ArenaFull(Exception):
+    """
+    Raised by append() when the blob does not fit in the mapped file.
+    """
+
+
+class SharedStore:
+    """
+    Memory-mapped store holding one collection per resume section.
+
+    Parameters
+    ----------
+    path : str
+        File backing the store; every worker opening it sees the same data.
+    models : dict
+        Maps each section name to its dataclass.
+    size : int
+        Initial size of the file in bytes; the arena is compacted when it
+        fills up, and the file doubled when that frees less than half.
+    """
+
+    def __init__(self, path, models, size=16 * 1024 * 1024):
+        self.models = models
+        self.sections = list(models)
+        # Magic, sequence number, bytes used, file size, section indexes
+        self._header = struct.Struct(f"<8sQQQ{len(self.sections)}Q")
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = _FileLock(self._fd, threading.Lock())
+        self._local = threading.local()
+        with self._lock:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, 0)
+            self.created = self._map[: len(MAGIC)] != MAGIC
+            if self.created:
+                self._map[: self._header.size] = bytes(self._header.size)
+                self._size = len(self._map)
+                self._publish(self._header.size, [0] * len(self.sections))
+
+    def attach(self, initial):
+        """
+        Returns shared collections for each section.
+
+        Parameters
+        ----------
+        initial : dict
+            Entries to store if the file has just been created.
+
+        Returns
+        -------
+        dict
+            Maps each section name to its SharedCollection.
+        """
+        collections = {name: SharedCollection(self, name) for name in self.sections}
+        if self.created:
+            for name, items in initial.items():
+                collections[name][:] = items
+        return collections
+
+    @property
+    def version(self):
+        """
+        The store's sequence number; it changes on every write.
+        """
+        return _U64.unpack_from(self._map, len(MAGIC))[0]
+
+    @property
+    def last_write(self):
+        """
+        The version this thread's last write left the store at, or None.
+        """
+        return getattr(self._local, "version", None)
+
+    def read(self, section, reader):
+        """
+        Calls reader(offsets) on a consistent snapshot of a section.
+
+        Parameters
+        ----------
+        section : str
+            The section to read.
+        reader : callable
+            Receives the list of record offsets and returns the result.
+        """
+        position = self.sections.index(section)
+        while True:
+            seq = self.version
+            if seq % 2:
+                # A write is in progress; let the writer run
+                time.sleep(0)
+                continue
+            self._remap()
+            try:
+                offsets = self._offsets(self._header.unpack_from(self._map)[4 + position])
+                result = reader(offsets)
+            except (ValueError, TypeError, struct.error, IndexError):
+                if self.version == seq:
+                    raise
+                time.sleep(0)
+                continue
+            if self.version == seq:
+                return result
+            time.sleep(0)
+
+    def write(self, section, writer):
+        """
+        Replaces a section's index with writer(offsets) atomically.
+
+        Parameters
+        ----------
+        section : str
+            The section to modify.
+        writer : callable
+            Receives the current record offsets and returns the new ones,
+            using append() to add records, or None to leave them as they
+            are. It runs under the write lock, and is called again if the
+            arena has to be compacted or grown first.
+
+        Raises
+        ------
+        StoreFullError
+            If the file cannot be grown to fit the write.
+        """
+        position = self.sections.index(section)
+        with self._lock:
+            self._remap()
+            try:
+                indexes = self._write(position, writer)
+            except _ArenaFull:
+                self._compact()
+                if self._used > len(self._map) // 2:
+                    self._grow()
+                while True:
+                    try:
+                        indexes = self._write(position, writer)
+                        break
+                    except _ArenaFull:
+                        self._grow()
+            if indexes is not None:
+                self._publish(self._used, indexes)
+            self._local.version = self.version
+
+    def append(self, blob):
+        """
+        Appends a blob to the arena and returns its offset.
+
+        Must be called from within write(); the blob only becomes visible to
+        readers once write() publishes an index referring to it.
+        """
+        offset = self._used
+        if offset + _U32.size + len(blob) > len(self._map):
+            raise _ArenaFull
+        _U32.pack_into(self._map, offset, len(blob))
+        self._map[offset + _U32.size : offset + _U32.size + len(blob)] = blob
+        self._used = offset + _U32.size + len(blob)
+        return offset
+
+    def blob(self, offset):
+        """
+        Returns the bytes of the blob at offset.
+        """
+        size = _U32.unpack_from(self._map, offset)[0]
+        return self._map[offset + _U32.size : offset + _U32.size + size]
+
+    def compact(self):
+        """
+        Rewrites the arena keeping only the blobs that are still referenced.
+        """
+        with self._lock:
+            self._compact()
+
+    def _write(self, position, writer):
+        """
+        Appends the new index for a section and returns all section indexes.
+        """
+        indexes = list(self._header.unpack_from(self._map)[4:])
+        offsets = writer(self._offsets(indexes[position]))
+        if offsets is None:
+            return None
+        indexes[position] = self.append(b"".join(_U64.pack(offset) for offset in offsets))
+        return indexes
+
+    def _compact(self):
+        """
+        Compacts the arena; readers retry until it is done.
+        """
+        live = [
+            [self.blob(offset) for offset in self._offsets(index)]
+            for index in self._header.unpack_from(self._map)[4:]
+        ]
+        seq = self._begin_write()
+        self._used = self._header.size
+        indexes = []
+        for blobs in live:
+            offsets = [self.append(blob) for blob in blobs]
+            indexes.append(self.append(b"".join(_U64.pack(offset) for offset in offsets)))
+        self._header.pack_into(self._map, 0, MAGIC, seq + 1, self._used, self._size, *indexes)
+
+    def _offsets(self, index):
+        """
+        Decodes an index blob into a list of record offsets.
+        """
+        if not index:
+            return []
+        blob = self.blob(index)
+        return [offset for (offset,) in _U64.iter_unpack(blob)]
+
+    def _publish(self, used, indexes):
+        """
+        Swaps in new header values under the sequence lock.
+        """
+        seq = self._begin_write()
+        self._header.pack_into(self._map, 0, MAGIC, seq + 1, used, self._size, *indexes)
+
+    def _begin_write(self):
+        """
+        Makes the sequence number odd so readers wait, and returns it.
+
+        A writer that died mid-write leaves the number odd already; it is
+        kept odd here and made even again by the next publish.
+        """
+        seq = self.version | 1
+        _U64.pack_into(self._map, len(MAGIC), seq)
+        return seq
+
+    def _grow(self):
+        """
+        Doubles the file and records its new size for the other workers.
+        """
+        size = len(self._map) * 2
+        try:
+            # Allocate the blocks now so a full disk fails here, not as SIGBUS
+            os.posix_fallocate(self._fd, 0, size)
+        except OSError as error:
+            raise StoreFullError(f"Cannot grow shared store to {size} bytes") from error
+        self._map = mmap.mmap(self._fd, 0)
+        self._size = size
+
+    def _remap(self):
+        """
+        Maps the file again if another worker has grown it.
+        """
+        if self._size > len(self._map):
+            # Threads still reading the old mapping keep it alive until done
+            self._map = mmap.mmap(self._fd, 0)
+
+    @property
+    def _size(self):
+        return _U64.unpack_from(self._map, len(MAGIC) + 2 * _U64.size)[0]
+
+    @_size.setter
+    def _size(self, size):
+        _U64.pack_into(self._map, len(MAGIC) + 2 * _U64.size, size)
+
+    @property
+    def _used(self):
+        return _U64.unpack_from(self._map, len(MAGIC) + _U64.size)[0]
+
+    @_used.setter
+    def _used(self, used):
+        _U64.pack_into(self._map, len(MAGIC) + _U64.size, used)
+
+
+class _FileLock:
+    """
+    Exclusive lock across threads and processes.
+    """
+
+    def __init__(self, fd, thread_lock):
+        self._fd = fd
+        self._thread_lock = thread_lock
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class SharedCollection(MutableSequence):
+    """
+    List-like view of one section of a SharedStore.
+
+    Items are decoded into new model instances on every read, so changes
+    to an item must be written back by assigning it to its index.
+    """
+
+    def __init__(self, store, section):
+        self._store = store
+        self._section = section
+        self._model = store.models[section]
+
+    def _encode(self, item):
+        return json.dumps(asdict(item), separators=(",", ":")).encode("utf-8")
+
+    def _decode(self, offset):
+        return self._model(**json.loads(self._store.blob(offset)))
+
+    def __len__(self):
+        return self._store.read(self._section, len)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._store.read(
+                self._section, lambda offsets: [self._decode(o) for o in offsets[index]]
+            )
+        return self._store.read(self._section, lambda offsets: self._decode(offsets[index]))
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+
+        def writer(offsets):
+            if isinstance(index, slice):
+                offsets[index] = [self._store.append(self._encode(item)) for item in value]
+            else:
+                offsets[index] = self._store.append(self._encode(value))
+            return offsets
+
+        self._store.write(self._section, writer)
+
+    def __delitem__(self, index):
+        def writer(offsets):
+            del offsets[index]
+            return offsets
+
+        self._store.write(self._section, writer)
+
+    def insert(self, index, value):
+        def writer(offsets):
+            offsets.insert(index, self._store.append(self._encode(value)))
+            return offsets
+
+        self._store.write(self._section, writer)
+
+    def append(self, value):
+        """
+        Appends an entry and returns its index, atomically across workers.
+        """
+        index = []
+
+        def writer(offsets):
+            index[:] = [len(offsets)]
+            offsets.append(self._store.append(self._encode(value)))
+            return offsets
+
+        self._store.write(self._section, writer)
+        return index[0]
+
+    def pop(self, index=-1):
+        """
+        Removes and returns an entry, atomically across workers.
+        """
+        return self.update(lambda items: items.pop(index))
+
+    def update(self, change):
+        """
+        Atomically applies change(items) to the section's entries.
+
+        change receives the decoded entries as a list and modifies it in
+        place; it runs once, under the store's write lock. Entries it keeps
+        are not re-encoded. Returns the value returned by change.
+        """
+        state = {}
+
+        def writer(offsets):
+            if not state:
+                items = [self._decode(offset) for offset in offsets]
+                # Keep the originals alive so their ids cannot be reused
+                state["originals"] = list(items)
+                positions = {id(item): i for i, item in enumerate(items)}
+                state["result"] = change(items)
+                state["items"] = [(item, positions.get(id(item))) for item in items]
+                state["unchanged"] = [position for _, position in state["items"]] == list(
+                    range(len(offsets))
+                )
+            if state["unchanged"]:
+                return None
+            # Positions still hold after a compaction, which keeps the order
+            return [
+                offsets[position]
+                if position is not None
+                else self._store.append(self._encode(item))
+                for item, position in state["items"]
+            ]
+
+        self._store.write(self._section, writer)
+        return state["result"]
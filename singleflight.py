@@ -0,0 +1,85 @@
+"""
+Request coalescing for concurrent identical computations.
+"""
+
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class _Call:
+    """
+    An in-progress computation that other callers can wait on.
+    """
+
+    done: threading.Event = field(default_factory=threading.Event)
+    result: object = None
+    error: Exception = None
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    Callers arriving while a computation for the same key is in progress
+    wait for it and share its result (or exception) instead of repeating it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        """
+        Returns compute(), sharing the result with concurrent callers.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifies the computation; callers with equal keys are coalesced.
+        compute : callable
+            Produces the result when no computation for key is in progress.
+
+        Returns
+        -------
+        object
+            The result of the leading caller's compute().
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self):
+        """
+        Returns counters of total and coalesced calls.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,165 @@
+"""
+Skill name normalization and a character n-gram index of similar names.
+"""
+
+import bisect
+import math
+import re
+import threading
+import unicodedata
+
+_VERSION_SUFFIX = re.compile(r"^(.*[a-z]{3})\s*v?\d+(?:\.\d+)*$")
+
+
+def clean_name(name):
+    """
+    Tidies a skill name for display by trimming and collapsing whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFKC", name).split())
+
+
+def normalize_name(name):
+    """
+    Reduces a skill name to the key used to spot duplicates.
+
+    The name is cleaned, case-folded and stripped of a trailing version
+    number, so "Python ", "python3" and "Python 3.11" all become "python".
+    """
+    key = clean_name(name).casefold()
+    match = _VERSION_SUFFIX.match(key)
+    return match.group(1).rstrip() if match else key
+
+
+def ngrams(key, n=3):
+    """
+    Returns the set of character n-grams of a key padded with spaces.
+    """
+    padded = f" {key} "
+    return {padded[i : i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class SkillIndex:
+    """
+    Incrementally maintained index of skill names by normalized key,
+    recording the indexes of the stored skills with each key.
+
+    Similar names are found by Jaccard similarity of their trigrams. Only
+    the rarest trigrams of a query are looked up to gather candidates (any
+    name reaching the threshold must share one of them), and candidates are
+    then scored exactly, so queries stay fast on large indexes.
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._postings = {}
+        for item_id, name in enumerate(names):
+            self.add(name, item_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, names):
+        """
+        Replaces the indexed names with names, numbered from 0.
+        """
+        fresh = SkillIndex(names)
+        # pylint: disable=protected-access
+        with self._lock:
+            self._entries, self._postings = fresh._entries, fresh._postings
+
+    def add(self, name, item_id):
+        """
+        Records that the skill at item_id has a name.
+        """
+        key = normalize_name(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry["ids"].add(item_id)
+                return
+            grams = ngrams(key)
+            self._entries[key] = {"name": clean_name(name), "grams": grams, "ids": {item_id}}
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+
+    def discard(self, name, item_id):
+        """
+        Forgets the skill at item_id, which had a name, if present.
+        """
+        key = normalize_name(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return
+            entry["ids"].discard(item_id)
+            if entry["ids"]:
+                return
+            del self._entries[key]
+            for gram in entry["grams"]:
+                postings = self._postings[gram]
+                postings.discard(key)
+                if not postings:
+                    del self._postings[gram]
+
+    def renumber(self, removed):
+        """
+        Shifts the recorded indexes down past removed skills.
+
+        Parameters
+        ----------
+        removed : iterable
+            Indexes of skills that were removed (and already discarded).
+        """
+        removed = sorted(removed)
+        with self._lock:
+            for entry in self._entries.values():
+                entry["ids"] = {
+                    item_id - bisect.bisect_left(removed, item_id) for item_id in entry["ids"]
+                }
+
+    def similar(self, name, threshold=0.5, limit=10):
+        """
+        Finds indexed names similar to a name.
+
+        Parameters
+        ----------
+        name : str
+            The name to look up.
+        threshold : float
+            Minimum Jaccard similarity of trigrams, between 0 and 1.
+        limit : int
+            Maximum number of matches.
+
+        Returns
+        -------
+        list
+            Matches as dicts with the name, normalized key, similarity score
+            and indexes of the skills with that key, most similar first.
+        """
+        key = normalize_name(name)
+        grams = ngrams(key)
+        with self._lock:
+            rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+            probes = len(grams) - math.ceil(threshold * len(grams)) + 1
+            candidates = set()
+            for gram in rarest[:probes]:
+                candidates.update(self._postings.get(gram, ()))
+
+            matches = []
+            for candidate in candidates:
+                entry = self._entries[candidate]
+                shared = len(grams & entry["grams"])
+                score = shared / (len(grams) + len(entry["grams"]) - shared)
+                if score >= threshold:
+                    matches.append(
+                        {
+                            "name": entry["name"],
+                            "normalized": candidate,
+                            "score": round(score, 3),
+                            "count": len(entry["ids"]),
+                            "ids": sorted(entry["ids"]),
+                        }
+                    )
+        matches.sort(key=lambda match: (-match["score"], match["normalized"]))
+        return matches[:limit]
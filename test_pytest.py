@@ -1,8 +1,28 @@
+# pylint: disable=too-many-lines
+
 """
 Tests in Pytest
 """
 
-from app import app
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import app as app_module
+import render
+from admission import AdmissionController, MemoryBuckets, SharedBuckets
+from app import admission, app, changes, versions
+from idempotency import IdempotencyCache
+from models import Skill
+from render import render_fragment
+from shared_store import SharedStore, StoreFullError
+from skill_index import SkillIndex, normalize_name
+from versioned_store import CHUNK_SIZE, VersionedCollection, VersionedStore
+from singleflight import SingleFlight
 
 
 def test_client():
@@ -456,6 +476,18 @@ def test_skill_missing_fields():
     assert response.json["error"] == "Missing required fields"
 
 
+def test_skill_invalid_name():
+    """
+    Add skills with a null or blank name and check that they are rejected
+    """
+    client = app.test_client()
+    for name in (None, "  ", 42):
+        example_skill = {"name": name, "proficiency": "1 year", "logo": "example-logo.png"}
+        response = client.post("/resume/skill", json=example_skill)
+        assert response.status_code == 400
+        assert response.json["error"] == "Invalid data format"
+
+
 def test_skill_id_return():
     """
     Make sure the id of newly added skill is returned.
@@ -518,3 +550,1075 @@ def test_invalid_input_validation():
     # Test invalid data format
     response = client.post("/resume/experience", data="not json")
     assert response.status_code == 415
+
+
+def test_patch_experience_merge_patch():
+    """
+    Patch a single field of an experience and check the others are kept.
+    """
+    example_experience = {
+        "title": "Software Developer",
+        "company": "A Cooler Company",
+        "start_date": "October 2022",
+        "end_date": "Present",
+        "description": "Writing JavaScript Code",
+        "logo": "example-logo.png",
+    }
+    client = app.test_client()
+    item_id = client.post("/resume/experience", json=example_experience).json["id"]
+
+    response = client.patch(
+        f"/resume/experience/{item_id}",
+        json={"end_date": "May 2025", "unknown": "ignored"},
+        headers={"Content-Type": "application/merge-patch+json"},
+    )
+    assert response.status_code == 200
+    assert response.json == {**example_experience, "end_date": "May 2025"}
+    assert response.headers["ETag"] == client.get(
+        f"/resume/experience/{item_id}"
+    ).headers["ETag"]
+
+    # Removing a required field is rejected
+    response = client.patch(f"/resume/experience/{item_id}", json={"title": None})
+    assert response.status_code == 400
+
+
+def test_patch_skill_json_patch():
+    """
+    Apply a JSON Patch to a skill and request only the changed fields.
+    """
+    client = app.test_client()
+    item_id = client.post(
+        "/resume/skill",
+        json={"name": "Rust", "proficiency": "1 year", "logo": "example-logo.png"},
+    ).json["id"]
+
+    response = client.patch(
+        f"/resume/skill/{item_id}",
+        json=[
+            {"op": "test", "path": "/name", "value": "Rust"},
+            {"op": "replace", "path": "/proficiency", "value": "2 years"},
+        ],
+        headers={
+            "Content-Type": "application/json-patch+json",
+            "Prefer": "return=minimal",
+        },
+    )
+    assert response.status_code == 200
+    assert response.json == {"proficiency": "2 years"}
+
+    response = client.patch(
+        f"/resume/skill/{item_id}",
+        json=[{"op": "test", "path": "/name", "value": "Go"}],
+        headers={"Content-Type": "application/json-patch+json"},
+    )
+    assert response.status_code == 400
+
+    response = client.patch("/resume/skill/999", json={"name": "Go"})
+    assert response.status_code == 404
+
+
+def test_patch_if_match():
+    """
+    Check that a stale If-Match header is rejected with 412.
+    """
+    client = app.test_client()
+    etag = client.get("/resume/experience/0").headers["ETag"]
+
+    response = client.patch(
+        "/resume/experience/0",
+        json={"logo": "new-logo.png"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = client.patch(
+        "/resume/experience/0",
+        json={"logo": "other-logo.png"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 412
+
+
+def test_changes_catch_up():
+    """
+    Add a skill and check the change feed reports the insert after `since`.
+    """
+    client = app.test_client()
+    seq = client.get("/resume/changes").json["seq"]
+
+    example_skill = {"name": "Go", "proficiency": "1 year", "logo": "example-logo.png"}
+    item_id = client.post("/resume/skill", json=example_skill).json["id"]
+
+    response = client.get(f"/resume/changes?since={seq}")
+    assert response.status_code == 200
+    assert response.json["reset"] is False
+    assert response.json["events"] == [
+        {
+            "seq": seq + 1,
+            "section": "skill",
+            "op": "insert",
+            "id": item_id,
+            "data": example_skill,
+        }
+    ]
+
+    response = client.get(f"/resume/changes?since={seq + 100}")
+    assert response.json["reset"] is True
+
+
+def test_changes_stream():
+    """
+    Check the change feed streams buffered events as Server-Sent Events.
+    """
+    client = app.test_client()
+    seq = client.get("/resume/changes").json["seq"]
+    client.patch("/resume/skill/0", json={"proficiency": "3 years"})
+
+    response = client.get(
+        f"/resume/changes?since={seq}",
+        headers={"Accept": "text/event-stream"},
+        buffered=False,
+    )
+    assert response.mimetype == "text/event-stream"
+    chunk = next(response.response)
+    chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+    assert chunk.startswith(f"id: {seq + 1}\nevent: update\n")
+    response.close()
+
+
+def test_get_many_by_ids():
+    """
+    Fetch several skills by ID and check the missing IDs are reported.
+    """
+    client = app.test_client()
+    item_id = client.post(
+        "/resume/skill",
+        json={"name": "SQL", "proficiency": "3 years", "logo": "example-logo.png"},
+    ).json["id"]
+
+    response = client.get(f"/resume/skill?ids={item_id},0,9999")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json["items"]] == [item_id, 0]
+    assert response.json["items"][0]["data"]["name"] == "SQL"
+    assert response.json["missing"] == [9999]
+
+    response = client.get("/resume/skill?ids=1,a")
+    assert response.status_code == 400
+
+
+def test_delete_many():
+    """
+    Delete several experiences at once and check the rest are kept in order.
+    """
+    client = app.test_client()
+    item_ids = [
+        client.post(
+            "/resume/experience",
+            json={
+                "title": f"Role {i}",
+                "company": "A Cool Company",
+                "start_date": "October 2022",
+                "end_date": "Present",
+                "description": "Writing Python Code",
+                "logo": "example-logo.png",
+            },
+        ).json["id"]
+        for i in range(3)
+    ]
+    initial_length = len(client.get("/resume/experience").json)
+
+    response = client.post(
+        "/resume/experience/delete", json={"ids": [item_ids[0], 9999]}
+    )
+    assert response.status_code == 404
+    assert response.json["missing"] == [9999]
+    assert len(client.get("/resume/experience").json) == initial_length
+
+    response = client.post(
+        "/resume/experience/delete", json={"ids": [item_ids[0], item_ids[2]]}
+    )
+    assert response.status_code == 200
+    assert response.json["deleted"] == 2
+    remaining = client.get("/resume/experience").json
+    assert len(remaining) == initial_length - 2
+    assert remaining[item_ids[0]]["title"] == "Role 1"
+
+
+def test_delete_many_rejects_non_integer_ids():
+    """
+    Check that batch delete IDs must be JSON integers.
+    """
+    client = app.test_client()
+    initial_length = len(client.get("/resume/experience").json)
+    for ids in ([0.9], ["0"], [True], [0, None]):
+        response = client.post("/resume/experience/delete", json={"ids": ids})
+        assert response.status_code == 400
+    assert len(client.get("/resume/experience").json) == initial_length
+
+
+def test_single_flight_coalesces():
+    """
+    Check that concurrent identical computations run once and share a result.
+    """
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        started.set()
+        release.wait()
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+        for _ in range(3)
+    ]
+    for follower in followers:
+        follower.start()
+    while flight.metrics()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert runs == [1]
+    assert results == ["result"] * 4
+    assert flight.metrics() == {"calls": 4, "coalesced": 3, "in_flight": 0}
+
+
+def test_metrics():
+    """
+    Check that list reads are counted in the single-flight metrics.
+    """
+    client = app.test_client()
+    calls = client.get("/metrics").json["single_flight"]["calls"]
+    response = client.get("/resume/skill")
+    assert response.status_code == 200
+    assert isinstance(response.json, list)
+    assert client.get("/metrics").json["single_flight"]["calls"] == calls + 1
+
+
+def test_idempotency_key_replays_post():
+    """
+    Retry a skill POST with the same Idempotency-Key and check it is not
+    inserted twice.
+    """
+    client = app.test_client()
+    example_skill = {"name": "Kotlin", "proficiency": "1 year", "logo": "example-logo.png"}
+    headers = {"Idempotency-Key": f"skill-{time.time()}"}
+    initial_length = len(client.get("/resume/skill").json)
+
+    first = client.post("/resume/skill", json=example_skill, headers=headers)
+    retry = client.post("/resume/skill", json=example_skill, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json["id"] == first.json["id"]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get("/resume/skill").json) == initial_length + 1
+
+    response = client.post(
+        "/resume/skill", json={**example_skill, "name": "Swift"}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+def test_idempotency_cache_bounds(tmp_path):
+    """
+    Check that the idempotency cache expires, caps and persists its entries.
+    """
+    now = [0]
+    path = tmp_path / "idempotency.jsonl"
+    cache = IdempotencyCache(max_entries=2, ttl=10, path=str(path), clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert cache.get("a") is None
+    assert len(cache) == 2
+
+    now[0] = 5
+    cache.put("d", 4)
+    now[0] = 11
+    assert cache.get("b") is None
+    assert cache.get("d") == 4
+
+    reloaded = IdempotencyCache(max_entries=2, ttl=10, path=str(path), clock=lambda: now[0])
+    assert len(reloaded) == 1
+    assert reloaded.get("d") == 4
+
+
+def test_shared_store(tmp_path):
+    """
+    Check that writes through one shared store are seen by another opened
+    on the same file, as they would be by another worker.
+    """
+    path = str(tmp_path / "store.bin")
+    skills = [Skill("Python", "1-2 Years", "example-logo.png")]
+    worker_a = SharedStore(path, {"skill": Skill}).attach({"skill": skills})
+    worker_b = SharedStore(path, {"skill": Skill}).attach({"skill": []})
+
+    assert list(worker_b["skill"]) == skills
+    worker_a["skill"].append(Skill("Go", "1 year", "example-logo.png"))
+    worker_b["skill"][0] = Skill("Python", "3 years", "example-logo.png")
+    del worker_b["skill"][1]
+    assert list(worker_a["skill"]) == [Skill("Python", "3 years", "example-logo.png")]
+
+
+def test_shared_store_compacts(tmp_path):
+    """
+    Check that the arena is compacted instead of filling up on rewrites.
+    """
+    store = SharedStore(str(tmp_path / "store.bin"), {"skill": Skill}, size=4096)
+    skills = store.attach({"skill": []})["skill"]
+    for i in range(200):
+        skills[:] = [Skill(f"Skill {i}", "1 year", "example-logo.png")]
+    assert list(skills) == [Skill("Skill 199", "1 year", "example-logo.png")]
+
+
+def test_render_resume():
+    """
+    Render the resume as HTML, Markdown and PDF.
+    """
+    client = app.test_client()
+    client.post(
+        "/resume/skill",
+        json={"name": "<Haskell>", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+
+    response = client.get("/resume/render?format=html")
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+    assert "<h2>Experience</h2>" in response.text
+    assert "&lt;Haskell&gt; (1 year)" in response.text
+
+    response = client.get("/resume/render?format=md")
+    assert response.status_code == 200
+    assert response.text.startswith("# Resume\n\n## Experience")
+    assert "- <Haskell> (1 year)" in response.text
+
+    response = client.get("/resume/render?format=pdf")
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert response.data.startswith(b"%PDF-1.4")
+    assert response.data.endswith(b"%%EOF\n")
+
+    response = client.get("/resume/render?format=docx")
+    assert response.status_code == 400
+
+
+def test_render_fragment_cache():
+    """
+    Check that a fragment is re-rendered only when its entry changes.
+    """
+    item = Skill("Elixir", "1 year", "example-logo.png")
+    first = render_fragment("md", "skill", item)
+    assert render_fragment("md", "skill", item) is first
+
+    item.proficiency = "2 years"
+    assert render_fragment("md", "skill", item) == "- Elixir (2 years)"
+
+
+def test_history_and_as_of():
+    """
+    Update a skill and check that its past versions can still be read.
+    """
+    client = app.test_client()
+    response = client.post(
+        "/resume/skill",
+        json={"name": "Scala", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    item_id = response.json["id"]
+    created = int(response.headers["X-Resume-Version"])
+
+    response = client.patch(f"/resume/skill/{item_id}", json={"proficiency": "2 years"})
+    assert int(response.headers["X-Resume-Version"]) == created + 1
+
+    response = client.get(f"/resume/skill/{item_id}/history")
+    assert response.status_code == 200
+    assert [change["data"]["proficiency"] for change in response.json[-2:]] == [
+        "1 year",
+        "2 years",
+    ]
+    assert response.json[-1]["version"] == created + 1
+
+    response = client.get(f"/resume/skill?as_of={created}")
+    assert response.json[item_id]["proficiency"] == "1 year"
+    assert client.get("/resume/skill").json[item_id]["proficiency"] == "2 years"
+
+    assert client.get("/resume/skill?as_of=0").status_code == 404
+    assert client.post("/resume/skill?as_of=1", json={}).status_code == 400
+
+
+def test_versioned_store_snapshot_isolation():
+    """
+    Check that a pinned snapshot is not affected by later writes and that
+    only the latest versions are retained.
+    """
+    store = VersionedStore(retention=2)
+    skills = store.attach({"skill": [Skill("Python", "1 year", "example-logo.png")]})["skill"]
+
+    token = store.pin()
+    writer = threading.Thread(
+        target=lambda: skills.append(Skill("Go", "1 year", "example-logo.png"))
+    )
+    writer.start()
+    writer.join()
+    assert len(skills) == 1
+    store.unpin(token)
+    assert len(skills) == 2
+
+    skills[0] = Skill("Python", "2 years", "example-logo.png")
+    assert store.at(1) is None
+    assert store.at(2)[1]["skill"][1] is store.at(3)[1]["skill"][1]
+
+
+def test_rate_limit(monkeypatch):
+    """
+    Check that a client exceeding its rate gets 429 with Retry-After while
+    other clients are still served, and cannot escape by changing headers.
+    """
+    monkeypatch.setattr(admission, "rate", 0.5)
+    monkeypatch.setattr(admission, "burst", 2)
+    client = app.test_client()
+    bulk = {"REMOTE_ADDR": f"10.0.0.{int(time.time() * 1000) % 250}"}
+
+    assert client.get("/resume/skill", environ_base=bulk).status_code == 200
+    assert client.get("/resume/skill", environ_base=bulk).status_code == 200
+    response = client.get("/resume/skill", environ_base=bulk)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    response = client.get(
+        "/resume/skill", environ_base=bulk, headers={"X-Client-Id": "rotated"}
+    )
+    assert response.status_code == 429
+    other = {"REMOTE_ADDR": "10.0.1.1"}
+    assert client.get("/resume/skill", environ_base=other).status_code == 200
+
+
+def test_rate_limit_trusted_client_header(monkeypatch):
+    """
+    Check that the client header is used as the identity when configured.
+    """
+    monkeypatch.setattr(admission, "rate", 0.5)
+    monkeypatch.setattr(admission, "burst", 1)
+    monkeypatch.setattr("app.RATE_LIMIT_CLIENT_HEADER", "X-Client-Id")
+    client = app.test_client()
+    headers = {"X-Client-Id": f"bulk-{time.time()}"}
+
+    assert client.get("/resume/skill", headers=headers).status_code == 200
+    assert client.get("/resume/skill", headers=headers).status_code == 429
+    assert client.get("/resume/skill", headers={"X-Client-Id": "other"}).status_code == 200
+
+
+def test_token_buckets(tmp_path):
+    """
+    Check that in-memory and shared token buckets refill over time.
+    """
+    now = [0.0]
+    memory = MemoryBuckets(clock=lambda: now[0])
+    shared = SharedBuckets(str(tmp_path / "buckets.bin"), slots=16, clock=lambda: now[0])
+    for buckets in (memory, shared):
+        assert buckets.take("client", 1, 2) == 0
+        assert buckets.take("client", 1, 2) == 0
+        assert buckets.take("client", 1, 2) == 1
+        now[0] += 1
+        assert buckets.take("client", 1, 2) == 0
+        now[0] = 0.0
+
+    # The bucket emptied at t=1 above is shared, so one token is back at t=2
+    other_worker = SharedBuckets(str(tmp_path / "buckets.bin"), slots=16, clock=lambda: now[0])
+    now[0] = 2.0
+    assert other_worker.take("client", 1, 2) == 0
+    assert other_worker.take("client", 1, 2) == 1
+
+
+def test_shared_buckets_collisions(tmp_path):
+    """
+    Check that a client hashed into a full set does not reset another
+    client's bucket, and takes over a slot once it has gone idle.
+    """
+    now = [0.0]
+    buckets = SharedBuckets(str(tmp_path / "buckets.bin"), slots=4, clock=lambda: now[0])
+    for client in ("a", "b", "c", "d"):
+        assert buckets.take(client, 1, 2) == 0
+        assert buckets.take(client, 1, 2) == 0
+        now[0] += 0.1
+
+    # Every slot is active, so "e" shares the least recently used bucket
+    assert buckets.take("e", 1, 2) > 0
+    assert buckets.take("a", 1, 2) > 0
+
+    now[0] += 3
+    assert buckets.take("e", 1, 2) == 0
+    assert buckets.take("e", 1, 2) == 0
+    assert buckets.take("e", 1, 2) > 0
+
+
+def test_concurrency_limit_sheds():
+    """
+    Check that requests waiting too long for a slot are shed with 503.
+    """
+    controller = AdmissionController(write_limit=1, max_queue_time=0.01)
+    assert controller.admit("client", "write") == (0, 0)
+    assert controller.admit("client", "write") == (503, 1)
+    assert controller.admit("client", "read") == (0, 0)
+    controller.release("write")
+    assert controller.admit("client", "write") == (0, 0)
+    assert controller.metrics()["shed"] == 1
+
+
+def test_skill_normalization_and_similar():
+    """
+    Add near-duplicate skills and check they are suggested, found and merged.
+    """
+    client = app.test_client()
+    name = f"Zigzag{int(time.time() * 1000)}"
+    first = client.post(
+        "/resume/skill",
+        json={"name": f" {name}  Lang ", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    response = client.get(f"/resume/skill?ids={first.json['id']}")
+    assert response.json["items"][0]["data"]["name"] == f"{name} Lang"
+
+    second = client.post(
+        "/resume/skill",
+        json={"name": f"{name} lang3", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    assert second.status_code == 201
+    assert second.json["similar"][0]["name"] == f"{name} Lang"
+    assert second.json["similar"][0]["score"] == 1
+
+    response = client.get(f"/resume/skill/similar?name={name.lower()}%20lng")
+    assert response.status_code == 200
+    assert response.json["matches"][0]["count"] == 2
+
+    merged = client.post(
+        "/resume/skill?dedupe=merge",
+        json={"name": f"{name.upper()} LANG", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    assert merged.status_code == 200
+    assert merged.json == {"id": first.json["id"], "merged": True}
+
+    assert client.get("/resume/skill/similar").status_code == 400
+
+
+def test_skill_index_incremental():
+    """
+    Check that the skill index follows additions, removals and renumbering.
+    """
+    index = SkillIndex(["Python", "python3", "JavaScript"])
+    assert normalize_name(" Python  3.11 ") == "python"
+    assert len(index) == 2
+    assert index.similar("Pyth0n", threshold=0.3)[0]["name"] == "Python"
+    assert index.similar("python")[0]["ids"] == [0, 1]
+
+    index.discard("Python ", 0)
+    index.renumber([0])
+    assert index.similar("python")[0]["ids"] == [0]
+    assert index.similar("javascript")[0]["ids"] == [1]
+    index.discard("python3", 0)
+    assert not index.similar("python")
+    assert [match["name"] for match in index.similar("Javascript")] == ["JavaScript"]
+
+
+def _append_shared_skills(path, worker, count, queue):
+    """
+    Appends skills to a shared store from another process, reporting the
+    returned indexes.
+    """
+    skills = SharedStore(path, {"skill": Skill}).attach({"skill": []})["skill"]
+    queue.put(
+        [
+            (skills.append(Skill(f"{worker}-{i}", "1 year", "example-logo.png")), i)
+            for i in range(count)
+        ]
+    )
+
+
+def test_shared_store_concurrent_appends(tmp_path):
+    """
+    Check that indexes returned by appends from several processes point at
+    the appended entries.
+    """
+    path = str(tmp_path / "store.bin")
+    skills = SharedStore(path, {"skill": Skill}).attach({"skill": []})["skill"]
+    queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_append_shared_skills, args=(path, name, 100, queue))
+        for name in ("a", "b")
+    ]
+    for worker in workers:
+        worker.start()
+    results = {name: queue.get(timeout=30) for name in ("a", "b")}
+    for worker in workers:
+        worker.join()
+
+    stored = [item.name for item in skills]
+    assert len(stored) == 200
+    returned = sorted(index for indexes in results.values() for index, _ in indexes)
+    assert returned == list(range(200))
+    assert all(stored[index].endswith(f"-{i}") for indexes in results.values()
+               for index, i in indexes)
+
+
+def test_shared_store_update(tmp_path):
+    """
+    Check that update applies a change atomically and keeps untouched entries.
+    """
+    skills = SharedStore(str(tmp_path / "store.bin"), {"skill": Skill}).attach(
+        {"skill": [Skill(name, "1 year", "example-logo.png") for name in "abc"]}
+    )["skill"]
+
+    def change(items):
+        del items[1]
+        items.append(Skill("d", "1 year", "example-logo.png"))
+        return "done"
+
+    assert skills.update(change) == "done"
+    assert [item.name for item in skills] == ["a", "c", "d"]
+    assert skills.pop(0).name == "a"
+    assert skills.update(lambda items: None) is None
+    assert [item.name for item in skills] == ["c", "d"]
+
+
+def test_versioned_append_from_pinned_snapshot():
+    """
+    Check that an append made while a stale snapshot is pinned returns the
+    index it was committed at.
+    """
+    store = VersionedStore()
+    skills = store.attach({"skill": []})["skill"]
+
+    token = store.pin()
+    writer = threading.Thread(
+        target=lambda: skills.append(Skill("B", "1 year", "example-logo.png"))
+    )
+    writer.start()
+    writer.join()
+    item_id = skills.append(Skill("A", "1 year", "example-logo.png"))
+    store.unpin(token)
+
+    assert [item.name for item in skills] == ["B", "A"]
+    assert item_id == 1
+    assert skills.pop(0).name == "B"
+    assert [item.name for item in skills] == ["A"]
+
+
+def test_delete_many_keeps_concurrent_insert(monkeypatch):
+    """
+    Check that an insert committed after a request pinned its snapshot
+    survives a batch delete made by that request.
+    """
+    client = app.test_client()
+    initial = [item["name"] for item in client.get("/resume/skill").json]
+    item_id = client.post(
+        "/resume/skill",
+        json={"name": "Perl", "proficiency": "1 year", "logo": "example-logo.png"},
+    ).json["id"]
+
+    original_update = VersionedCollection.update
+
+    def update_after_insert(collection, change):
+        monkeypatch.setattr(VersionedCollection, "update", original_update)
+        # Another request inserts after this one pinned its snapshot
+        collection.update(
+            lambda items: items.append(Skill("Concurrent", "1 year", "example-logo.png"))
+        )
+        return original_update(collection, change)
+
+    monkeypatch.setattr(VersionedCollection, "update", update_after_insert)
+    response = client.post("/resume/skill/delete", json={"ids": [item_id]})
+    assert response.status_code == 200
+    names = [item["name"] for item in client.get("/resume/skill").json]
+    assert names == initial + ["Concurrent"]
+
+
+def test_patch_skill_if_match_is_atomic(monkeypatch):
+    """
+    Check that If-Match is checked against the entry the PATCH replaces,
+    not against the one the request first saw.
+    """
+    client = app.test_client()
+    item_id = client.post(
+        "/resume/skill",
+        json={"name": "Dart", "proficiency": "1 year", "logo": "example-logo.png"},
+    ).json["id"]
+    response = client.get(f"/resume/skill/{item_id}")
+    assert response.status_code == 200
+    assert response.json["name"] == "Dart"
+    etag = response.headers["ETag"]
+
+    original_update = VersionedCollection.update
+
+    def update_after_concurrent_patch(collection, change):
+        monkeypatch.setattr(VersionedCollection, "update", original_update)
+        collection[item_id] = Skill("Dart", "2 years", "example-logo.png")
+        return original_update(collection, change)
+
+    monkeypatch.setattr(VersionedCollection, "update", update_after_concurrent_patch)
+    response = client.patch(
+        f"/resume/skill/{item_id}",
+        json={"proficiency": "3 years"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 412
+    assert client.get(f"/resume/skill/{item_id}").json["proficiency"] == "2 years"
+    assert client.get("/resume/skill/9999").status_code == 404
+
+
+def test_patch_skill_name_is_validated():
+    """
+    Check that PATCH rejects non-string skill names and tidies valid ones.
+    """
+    client = app.test_client()
+    item_id = client.post(
+        "/resume/skill",
+        json={"name": "Lua", "proficiency": "1 year", "logo": "example-logo.png"},
+    ).json["id"]
+
+    for name in (123, ["x"], "  "):
+        response = client.patch(f"/resume/skill/{item_id}", json={"name": name})
+        assert response.status_code == 400
+    assert client.get(f"/resume/skill/{item_id}").json["name"] == "Lua"
+
+    response = client.patch(f"/resume/skill/{item_id}", json={"name": "  Lua   JIT "})
+    assert response.status_code == 200
+    assert response.json["name"] == "Lua JIT"
+    matches = client.get("/resume/skill/similar?name=lua%20jit").json["matches"]
+    assert matches[0]["name"] == "Lua JIT"
+    assert not client.get("/resume/skill/similar?name=lua&threshold=1").json["matches"]
+
+
+def test_skill_merge_after_batch_delete():
+    """
+    Check that merges return the skill's index after earlier skills were
+    deleted.
+    """
+    client = app.test_client()
+    name = f"Quokka{int(time.time() * 1000)}"
+    skill = {"proficiency": "1 year", "logo": "example-logo.png"}
+    first = client.post("/resume/skill", json={"name": f"{name}a", **skill}).json["id"]
+    second = client.post("/resume/skill", json={"name": f"{name}lang", **skill}).json["id"]
+
+    client.post("/resume/skill/delete", json={"ids": [first]})
+    merged = client.post("/resume/skill?dedupe=merge", json={"name": f"{name} Lang", **skill})
+    assert merged.json == {"id": second - 1, "merged": True}
+    assert client.get(f"/resume/skill/{second - 1}").json["name"] == f"{name}lang"
+
+
+def test_rate_limit_below_one_per_second():
+    """
+    Check that a rate below one request per second still admits requests.
+    """
+    now = [0.0]
+    controller = AdmissionController(rate=0.5, buckets=MemoryBuckets(clock=lambda: now[0]))
+    assert controller.burst == 1
+    assert controller.admit("client", "read") == (0, 0)
+    controller.release("read")
+    assert controller.admit("client", "read") == (429, 2)
+    now[0] = 2.0
+    assert controller.admit("client", "read") == (0, 0)
+
+
+def test_idempotency_file_is_compacted(tmp_path):
+    """
+    Check that the persistence file does not grow beyond twice the cap.
+    """
+    path = tmp_path / "idempotency.jsonl"
+    cache = IdempotencyCache(max_entries=3, path=str(path))
+    for i in range(50):
+        cache.put(f"key-{i}", i)
+        assert len(path.read_text().splitlines()) <= 6
+    assert IdempotencyCache(max_entries=3, path=str(path)).get("key-49") == 49
+
+
+def test_idempotency_file_shared_between_processes(tmp_path):
+    """
+    Check that compacting keeps the entries other processes appended.
+    """
+    path = tmp_path / "idempotency.jsonl"
+    worker_a = IdempotencyCache(max_entries=10, path=str(path))
+    worker_b = IdempotencyCache(max_entries=10, path=str(path))
+    for i in range(21):
+        worker_b.put(f"from-b-{i}", i)
+        if i == 15:
+            worker_a.put("from-a", 1)
+    assert worker_b.get("from-a") == 1
+    assert IdempotencyCache(max_entries=10, path=str(path)).get("from-b-20") == 20
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == [
+        "idempotency.jsonl",
+        "idempotency.jsonl.lock",
+    ]
+
+
+def test_idempotency_keys_do_not_block_each_other():
+    """
+    Check that a key being handled holds up retries with the same key only.
+    """
+    cache = IdempotencyCache()
+    assert cache.begin("a") is None
+    assert cache.begin("b") is None
+    cache.finish("b", {"id": 2})
+
+    retried = []
+    retry = threading.Thread(target=lambda: retried.append(cache.begin("a")))
+    retry.start()
+    retry.join(0.05)
+    assert retry.is_alive()
+    cache.finish("a", {"id": 1})
+    retry.join()
+    assert retried == [{"id": 1}]
+
+
+def test_idempotency_key_covers_query_string():
+    """
+    Check that reusing a key with a different query string is rejected.
+    """
+    client = app.test_client()
+    example_skill = {"name": "Erlang", "proficiency": "1 year", "logo": "example-logo.png"}
+    headers = {"Idempotency-Key": f"query-{time.time()}"}
+
+    assert client.post("/resume/skill", json=example_skill, headers=headers).status_code == 201
+    response = client.post("/resume/skill?dedupe=merge", json=example_skill, headers=headers)
+    assert response.status_code == 422
+
+
+def test_render_pdf_recovers(monkeypatch):
+    """
+    Check that PDF rendering recovers from a dead worker, reports timeouts
+    as 503 and lays out plain text rather than Markdown.
+    """
+    # pylint: disable=protected-access
+    with pytest.raises(BrokenProcessPool):
+        render._pdf_pool().submit(os._exit, 1).result()
+
+    client = app.test_client()
+    response = client.get("/resume/render?format=pdf")
+    assert response.status_code == 200
+    assert b"(EXPERIENCE) Tj" in response.data
+    assert b"###" not in response.data
+
+    monkeypatch.setattr("app.render_pdf", lambda sections: None)
+    response = client.get("/resume/render?format=pdf")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_single_flight_keyed_on_pinned_version(monkeypatch):
+    """
+    Check that list reads are coalesced by the store version they are
+    pinned to, so a request never gets another version's body.
+    """
+    keys = []
+    original_do = SingleFlight.do
+
+    def record_key(flight, key, compute):
+        keys.append(key)
+        return original_do(flight, key, compute)
+
+    monkeypatch.setattr(SingleFlight, "do", record_key)
+    client = app.test_client()
+    response = client.get("/resume/skill")
+    assert keys[-1][2] == int(response.headers["X-Resume-Version"])
+
+    version = keys[-1][2]
+    client.post(
+        "/resume/skill",
+        json={"name": "OCaml", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    response = client.get(f"/resume/skill?as_of={version}")
+    assert keys[-1][2] == version
+    assert response.headers["X-Resume-Version"] == str(version)
+
+
+def test_shared_store_recovers_from_dead_writer(tmp_path):
+    """
+    Check that a writer dying mid-write does not leave readers waiting.
+    """
+    store = SharedStore(str(tmp_path / "store.bin"), {"skill": Skill})
+    skills = store.attach({"skill": []})["skill"]
+    # pylint: disable=protected-access
+    store._begin_write()
+    assert store.version % 2
+
+    skills.append(Skill("Go", "1 year", "example-logo.png"))
+    assert store.version % 2 == 0
+    assert len(skills) == 1
+
+
+def test_shared_store_grows(tmp_path):
+    """
+    Check that the file grows when compacting frees too little, and that
+    other workers remap it.
+    """
+    path = str(tmp_path / "store.bin")
+    worker_a = SharedStore(path, {"skill": Skill}, size=4096).attach({"skill": []})["skill"]
+    worker_b = SharedStore(path, {"skill": Skill}, size=4096).attach({"skill": []})["skill"]
+    skills = [Skill(f"Skill {i}", "1 year", "example-logo.png") for i in range(200)]
+    for skill in skills:
+        worker_a.append(skill)
+    assert os.path.getsize(path) > 4096
+    assert list(worker_b) == skills
+    worker_b.append(Skill("Go", "1 year", "example-logo.png"))
+    assert len(worker_a) == 201
+
+
+def test_shared_store_full(tmp_path, monkeypatch):
+    """
+    Check that a store that cannot grow is reported as a 507.
+    """
+    path = str(tmp_path / "store.bin")
+    skills = SharedStore(path, {"skill": Skill}, size=4096).attach({"skill": []})["skill"]
+
+    def fail(*_args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "posix_fallocate", fail)
+    with pytest.raises(StoreFullError):
+        for i in range(200):
+            skills.append(Skill(f"Skill {i}", "1 year", "example-logo.png"))
+
+    def full():
+        raise StoreFullError("full")
+
+    monkeypatch.setitem(app.view_functions, "hello_world", full)
+    response = app.test_client().get("/test")
+    assert response.status_code == 507
+
+
+def test_put_experience_checks_index_atomically(monkeypatch):
+    """
+    Check that a PUT to an entry deleted after the request pinned its
+    snapshot returns 404 instead of failing.
+    """
+    client = app.test_client()
+    entry = {
+        "title": "Engineer",
+        "company": "Example",
+        "start_date": "2020",
+        "end_date": "2021",
+        "description": "Work",
+        "logo": "example-logo.png",
+    }
+    item_id = client.post("/resume/experience", json=entry).json["id"]
+
+    original_update = VersionedCollection.update
+
+    def update_after_delete(collection, change):
+        monkeypatch.setattr(VersionedCollection, "update", original_update)
+        collection.pop(item_id)
+        return original_update(collection, change)
+
+    monkeypatch.setattr(VersionedCollection, "update", update_after_delete)
+    response = client.put(f"/resume/experience/{item_id}", json=entry)
+    assert response.status_code == 404
+    assert len(client.get("/resume/experience").json) == item_id
+
+
+def test_changes_published_with_commit(monkeypatch):
+    """
+    Check that mutations publish their change while still holding the
+    store's lock, so the feed's order matches the commit order.
+    """
+    client = app.test_client()
+    publish = changes.publish
+    locked = []
+
+    def record(*args):
+        # pylint: disable=protected-access
+        locked.append(versions._lock.locked())
+        return publish(*args)
+
+    monkeypatch.setattr(changes, "publish", record)
+    entry = {
+        "title": "Engineer",
+        "company": "Example",
+        "start_date": "2020",
+        "end_date": "2021",
+        "description": "Work",
+        "logo": "example-logo.png",
+    }
+    item_id = client.post("/resume/experience", json=entry).json["id"]
+    assert client.put(f"/resume/experience/{item_id}", json=entry).status_code == 200
+    education_id = len(client.get("/resume/education").json) - 1
+    education_entry = client.get(f"/resume/education/{education_id}").json
+    response = client.put(f"/resume/education/{education_id}", json=education_entry)
+    assert response.status_code == 200
+    assert client.delete(f"/resume/education/{education_id}").status_code == 200
+    assert locked == [True] * 4
+
+
+def test_skill_names_follow_shared_store(tmp_path, monkeypatch):
+    """
+    Check that skills added by another worker are found and merged with.
+    """
+    path = str(tmp_path / "store.bin")
+    store = SharedStore(path, {"skill": Skill})
+    skills = store.attach({"skill": [Skill("Python", "1 year", "example-logo.png")]})["skill"]
+    monkeypatch.setattr(app_module, "shared_store", store)
+    monkeypatch.setitem(app_module.data, "skill", skills)
+    monkeypatch.setattr(app_module, "skill_names", SkillIndex(["Python"]))
+    monkeypatch.setitem(app_module.skill_names_version, "version", store.version)
+
+    other_worker = SharedStore(path, {"skill": Skill}).attach({"skill": []})["skill"]
+    other_worker.append(Skill("Kotlin", "1 year", "example-logo.png"))
+
+    client = app.test_client()
+    response = client.get("/resume/skill/similar?name=kotlin")
+    assert response.json["matches"][0]["ids"] == [1]
+
+    other_worker.pop(0)
+    merged = client.post(
+        "/resume/skill?dedupe=merge",
+        json={"name": "KOTLIN", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    assert merged.json == {"id": 0, "merged": True}
+
+    client.post(
+        "/resume/skill",
+        json={"name": "Rust", "proficiency": "1 year", "logo": "example-logo.png"},
+    )
+    assert app_module.skill_names_version["version"] == store.version
+
+
+def test_text_to_pdf_wraps_and_encodes():
+    """
+    Check that long lines are wrapped to the page and text is WinAnsi encoded.
+    """
+    # pylint: disable=protected-access
+    lines = render.wrap_line("  - " + "word " * 40, render._LINE_WIDTH)
+    assert len(lines) == 3
+    assert all(line.startswith("  ") for line in lines)
+    assert all(render.text_width(line) <= render._LINE_WIDTH for line in lines)
+    assert len(render.wrap_line("W" * 100, render._LINE_WIDTH)) == 3
+
+    document = render.text_to_pdf(["Café – €5"])
+    assert b"/Encoding /WinAnsiEncoding" in document
+    assert "Café – €5".encode("cp1252") in document
+
+
+def test_versioned_store_shares_chunks():
+    """
+    Check that a write copies only the chunks of entries it changes.
+    """
+    store = VersionedStore()
+    initial = [Skill(f"Skill {i}", "1 year", "example-logo.png") for i in range(3 * CHUNK_SIZE)]
+    skills = store.attach({"skill": initial})["skill"]
+
+    skills[CHUNK_SIZE + 1] = Skill("Go", "1 year", "example-logo.png")
+    skills.append(Skill("Rust", "1 year", "example-logo.png"))
+    first, second, third = (sections["skill"] for _, sections in store.history())
+    assert [chunk is old for chunk, old in zip(second.chunks, first.chunks)] == [True, False, True]
+    assert [chunk is old for chunk, old in zip(third.chunks, second.chunks)] == [True] * 3
+    assert len(third.chunks) == 4
+    assert third[CHUNK_SIZE + 1].name == "Go"
+    assert third[-1].name == "Rust"
+    assert list(third[-2:]) == [initial[-1], third[-1]]
+    assert list(skills) == list(third)
+    assert len(skills) == 3 * CHUNK_SIZE + 1
@@ -2,6 +2,9 @@
 Utility functions
 '''
 
+import hashlib
+import json
+
 # Define required fields for each type
 REQUIRED_FIELDS = {
     'experience': ['title', 'company', 'start_date', 'end_date', 'description', 'logo'],
@@ -33,3 +36,144 @@ def validate_data(data_type, data):
     if missing_fields:
         return False, f"Missing required fields: {', '.join(missing_fields)}"
     return True, None
+
+
+def record_etag(record):
+    '''
+    Computes a strong entity tag for a stored record
+
+    Parameters
+    ----------
+    record : dict
+        The record's fields, as returned by dataclasses.asdict
+
+    Returns
+    -------
+    str
+        Quoted entity tag derived from the record's content
+    '''
+    encoded = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return f'"{hashlib.sha1(encoded.encode("utf-8")).hexdigest()}"'
+
+
+def etag_matches(if_match, etag):
+    '''
+    Checks an If-Match header value against an entity tag
+
+    Parameters
+    ----------
+    if_match : str
+        The If-Match header value, a comma-separated list of tags or "*"
+    etag : str
+        The current entity tag of the record
+
+    Returns
+    -------
+    bool
+        True if the precondition holds
+    '''
+    tags = [tag.strip() for tag in if_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+def apply_merge_patch(target, patch):
+    '''
+    Applies an RFC 7396 JSON Merge Patch to a flat record
+
+    Parameters
+    ----------
+    target : dict
+        The record to patch; it is not modified
+    patch : dict
+        The merge patch document. A null value removes the field.
+
+    Returns
+    -------
+    dict
+        The patched record
+
+    Raises
+    ------
+    ValueError
+        If the patch is not a JSON object
+    '''
+    if not isinstance(patch, dict):
+        raise ValueError("Merge patch must be a JSON object")
+    result = dict(target)
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = value
+    return result
+
+
+def _patch_field(operation, member):
+    '''
+    Returns the field name addressed by a JSON Pointer in a patch operation
+    '''
+    pointer = operation.get(member)
+    if not isinstance(pointer, str) or not pointer.startswith('/') or pointer.count('/') != 1:
+        raise ValueError(f"Invalid '{member}' pointer: {pointer!r}")
+    return pointer[1:].replace('~1', '/').replace('~0', '~')
+
+
+def apply_json_patch(target, operations):
+    '''
+    Applies an RFC 6902 JSON Patch to a flat record
+
+    Only top-level pointers (e.g. "/title") are supported since records
+    have no nested values. The operations are applied atomically.
+
+    Parameters
+    ----------
+    target : dict
+        The record to patch; it is not modified
+    operations : list
+        The JSON Patch document
+
+    Returns
+    -------
+    dict
+        The patched record
+
+    Raises
+    ------
+    ValueError
+        If the document is malformed or an operation cannot be applied
+    '''
+    if not isinstance(operations, list):
+        raise ValueError("JSON Patch must be a JSON array")
+    result = dict(target)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValueError("JSON Patch operations must be JSON objects")
+        _apply_patch_operation(result, operation)
+    return result
+
+
+def _apply_patch_operation(result, operation):
+    '''
+    Applies a single JSON Patch operation to a record in place
+    '''
+    op = operation.get('op')
+    field = _patch_field(operation, 'path')
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise ValueError(f"'{op}' operation requires a value")
+    if op in ('replace', 'remove') and field not in result:
+        raise ValueError(f"Cannot {op} missing field '{field}'")
+
+    if op in ('add', 'replace'):
+        result[field] = operation['value']
+    elif op == 'remove':
+        del result[field]
+    elif op in ('move', 'copy'):
+        source = _patch_field(operation, 'from')
+        if source not in result:
+            raise ValueError(f"Cannot {op} missing field '{source}'")
+        result[field] = result.pop(source) if op == 'move' else result[source]
+    elif op == 'test':
+        if result.get(field) != operation['value']:
+            raise ValueError(f"Test failed for field '{field}'")
+    else:
+        raise ValueError(f"Unsupported operation: {op!r}")
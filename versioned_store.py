@@ -0,0 +1,276 @@
+"""
+In-memory resume store keeping a bounded history of versions.
+
+Every write produces a new immutable snapshot of all sections. Snapshots
+share the entries, the chunks of entries and the sections that did not
+change, and requests pin one snapshot so that all of their reads see the
+same version.
+"""
+
+import operator
+import threading
+from collections import deque
+from collections.abc import MutableSequence, Sequence
+from contextvars import ContextVar
+from itertools import chain
+
+# Entries per chunk of a section; a write copies only the chunks it changes
+CHUNK_SIZE = 256
+
+
+class VersionedStore:
+    """
+    Sequence of store versions, of which the latest `retention` are kept.
+
+    Parameters
+    ----------
+    retention : int
+        Number of versions kept for history and as-of reads.
+    """
+
+    def __init__(self, retention=100):
+        self._lock = threading.Lock()
+        self._versions = deque(maxlen=retention)
+        self._pinned = ContextVar("pinned_snapshot", default=None)
+
+    def attach(self, initial):
+        """
+        Stores the initial entries as the first version.
+
+        Parameters
+        ----------
+        initial : dict
+            Maps each section name to its entries.
+
+        Returns
+        -------
+        dict
+            Maps each section name to its VersionedCollection.
+        """
+        with self._lock:
+            self._versions.append(
+                (1, {name: Section(list(items)) for name, items in initial.items()})
+            )
+        return {name: VersionedCollection(self, name) for name in initial}
+
+    @property
+    def version(self):
+        """
+        The latest version number.
+        """
+        return self._versions[-1][0]
+
+    def at(self, version):
+        """
+        Returns the (version, sections) snapshot for a version, or None if
+        it is unknown or no longer retained.
+        """
+        with self._lock:
+            oldest = self._versions[0][0]
+            if not oldest <= version <= self.version:
+                return None
+            return self._versions[version - oldest]
+
+    def history(self):
+        """
+        Returns the retained (version, sections) snapshots, oldest first.
+        """
+        with self._lock:
+            return list(self._versions)
+
+    def pin(self, snapshot=None):
+        """
+        Makes reads in the current context see one snapshot.
+
+        Parameters
+        ----------
+        snapshot : tuple, optional
+            A (version, sections) snapshot; defaults to the latest.
+
+        Returns
+        -------
+        Token
+            Token to pass to unpin().
+        """
+        return self._pinned.set(snapshot or self._versions[-1])
+
+    def unpin(self, token):
+        """
+        Restores the snapshot pinned before the matching pin().
+        """
+        self._pinned.reset(token)
+
+    def pinned(self):
+        """
+        Returns the snapshot reads in this context see.
+        """
+        return self._pinned.get() or self._versions[-1]
+
+    def update(self, section, change):
+        """
+        Commits a new version with one section changed.
+
+        Parameters
+        ----------
+        section : str
+            The section to change.
+        change : callable
+            Receives a list copy of the section's latest entries and
+            modifies it in place. It runs under the store lock, so checks
+            it makes against the entries still hold when they are committed.
+
+        Returns
+        -------
+        object
+            The value returned by change. No version is committed if
+            change left the entries as they were.
+        """
+        with self._lock:
+            version, sections = self._versions[-1]
+            previous = sections[section]
+            items = list(previous)
+            result = change(items)
+            items = Section(items, previous)
+            if items.same_as(previous):
+                return result
+            snapshot = (version + 1, {**sections, section: items})
+            self._versions.append(snapshot)
+        # A request sees its own writes
+        if self._pinned.get() is not None:
+            self._pinned.set(snapshot)
+        return result
+
+
+class Section(Sequence):
+    """
+    Immutable sequence of a section's entries, stored in chunks.
+
+    Parameters
+    ----------
+    items : list
+        The entries.
+    previous : Section, optional
+        An earlier version of the section, whose chunks are reused where
+        they hold the same entries.
+    """
+
+    __slots__ = ("_chunks", "_length")
+
+    def __init__(self, items, previous=None):
+        old = previous.chunks if previous is not None else ()
+        chunks = []
+        for number, start in enumerate(range(0, len(items), CHUNK_SIZE)):
+            chunk = items[start : start + CHUNK_SIZE]
+            if (
+                number < len(old)
+                and len(old[number]) == len(chunk)
+                and all(map(operator.is_, chunk, old[number]))
+            ):
+                chunks.append(old[number])
+            else:
+                chunks.append(tuple(chunk))
+        self._chunks = tuple(chunks)
+        self._length = len(items)
+
+    @property
+    def chunks(self):
+        """
+        The tuples of entries the section is stored in.
+        """
+        return self._chunks
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Section index out of range")
+        return self._chunks[index // CHUNK_SIZE][index % CHUNK_SIZE]
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
+
+    def same_as(self, other):
+        """
+        Returns whether other holds the same entries in the same chunks.
+        """
+        return len(self._chunks) == len(other.chunks) and all(
+            map(operator.is_, self._chunks, other.chunks)
+        )
+
+
+class VersionedCollection(MutableSequence):
+    """
+    List-like view of one section of a VersionedStore.
+
+    Reads come from the pinned snapshot and writes create new versions.
+    Entries are shared between versions, so they must be replaced rather
+    than modified in place.
+    """
+
+    def __init__(self, store, section):
+        self._store = store
+        self._section = section
+
+    def _items(self):
+        return self._store.pinned()[1][self._section]
+
+    def __len__(self):
+        return len(self._items())
+
+    def __getitem__(self, index):
+        items = self._items()
+        return list(items[index]) if isinstance(index, slice) else items[index]
+
+    def __iter__(self):
+        return iter(self._items())
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+
+        def change(items):
+            items[index] = value
+
+        self._store.update(self._section, change)
+
+    def __delitem__(self, index):
+        def change(items):
+            del items[index]
+
+        self._store.update(self._section, change)
+
+    def insert(self, index, value):
+        def change(items):
+            items.insert(index, value)
+
+        self._store.update(self._section, change)
+
+    def append(self, value):
+        """
+        Appends an entry to the latest version and returns its index.
+        """
+
+        def change(items):
+            items.append(value)
+            return len(items) - 1
+
+        return self._store.update(self._section, change)
+
+    def pop(self, index=-1):
+        """
+        Removes and returns an entry of the latest version.
+        """
+        return self._store.update(self._section, lambda items: items.pop(index))
+
+    def update(self, change):
+        """
+        Atomically applies change(items) to the latest entries.
+
+        See VersionedStore.update; returns the value returned by change.
+        """
+        return self._store.update(self._section, change)